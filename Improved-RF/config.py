@@ -3,13 +3,15 @@ Configuración centralizada para experimentación.
 Cambia parámetros aquí sin tocar el código.
 """
 from dataclasses import dataclass, field
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Union
 
 
 @dataclass
 class DataConfig:
     """Configuración de datos."""
     data_path: str = 'koi_merged.csv'
+    # Lectura por bloques (bytes por bloque, pyarrow) para CSV grandes; None = de una vez
+    csv_block_bytes: Optional[int] = None
 
     # Features
     required_features: List[str] = field(default_factory=lambda: [
@@ -50,10 +52,15 @@ class DataConfig:
     smote_k_neighbors: int = 5
     smote_random_state: int = 42
 
+    # Caché en disco del pipeline (diagnostics/cache)
+    use_cache: bool = True
+
 
 @dataclass
 class ModelConfig:
     """Configuración del modelo."""
+    backend: str = 'random_forest'  # 'random_forest', 'hist_gbm'
+
     # Random Forest params
     n_estimators: int = 200
     max_depth: int = 15
@@ -62,11 +69,20 @@ class ModelConfig:
     max_features: str = 'sqrt'  # 'sqrt', 'log2', None
     class_weight: str = 'balanced'  # 'balanced', None, dict
 
+    # HistGradientBoosting params (backend='hist_gbm'; usa class_weight y random_state)
+    hgb_max_iter: int = 200
+    hgb_max_depth: int = 8
+    hgb_learning_rate: float = 0.1
+    hgb_early_stopping: bool = True
+
     # Training
     random_state: int = 42
     n_jobs: int = -1
     verbose: int = 0
 
+    # Guardado (joblib): 0 = sin comprimir (carga más rápida), o p.ej. ('lz4', 3)
+    save_compress: Union[int, Tuple[str, int]] = 0
+
 
 @dataclass
 class EvaluationConfig:
@@ -78,6 +94,7 @@ class EvaluationConfig:
     plot_confusion_matrix: bool = True
     plot_feature_importance: bool = True
     top_n_features: int = 15
+    plot_dpi: int = 300
 
     # Métricas
     metrics: List[str] = field(default_factory=lambda: [
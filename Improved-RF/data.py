@@ -4,15 +4,115 @@ Módulo de datos con correcciones críticas.
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
+from sklearn.neighbors import NearestNeighbors
 from typing import Dict, Tuple, Optional, List
 import logging
 from pathlib import Path
+from dataclasses import asdict
+import csv
+import functools
+import hashlib
 import json
 
 from config import DataConfig
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as pads
+except ImportError:  # pyarrow es opcional: se usa pd.read_csv como fallback
+    pa = pc = pacsv = pads = None
+
 logger = logging.getLogger(__name__)
 
+# Cachés en disco junto a este módulo, no relativas al directorio de trabajo
+CACHE_ROOT = Path(__file__).resolve().parent / 'diagnostics'
+STEP_CACHE_DIR = CACHE_ROOT / 'step_cache'
+STEP_CACHE_MAX_ENTRIES = 16
+# Versión del formato de DataCache: incrementar si cambia el contenido del frame cacheado
+CACHE_FORMAT_VERSION = 2
+
+# Features con data leakage → tipo de columna. DataLoader solo las carga para el
+# diagnóstico, y DataCleaner las elimina antes de entrenar
+LEAKAGE_FEATURES = {
+    'koi_score': 'float',          # Score de disposición (0.896 correlación)
+    'koi_pdisposition': 'string',  # Preliminary disposition
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _pipeline_source_digest() -> str:
+    """
+    Hash del código fuente de este módulo (DataCleaner, FeatureEngineer, reglas y
+    helpers). Forma parte de las claves de caché: editar una regla (p.ej. el límite
+    de koi_teq) invalida los resultados calculados con el código anterior.
+    """
+    return hashlib.blake2b(Path(__file__).read_bytes(), digest_size=16).hexdigest()
+
+
+def _evict_step_cache(max_entries: int = STEP_CACHE_MAX_ENTRIES):
+    """Política LRU: conserva las `max_entries` entradas usadas más recientemente (por mtime)."""
+    entries = sorted(STEP_CACHE_DIR.glob('*.pkl'), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in entries[max_entries:]:
+        stale.unlink(missing_ok=True)
+
+
+def cached_step(method):
+    """
+    Memoiza en disco una etapa determinista de DataCleaner.
+
+    La clave es el nombre de la etapa más `self.cache_key`, la clave de DataCache de
+    la ejecución, que ya cubre la versión de formato, el código del módulo, la
+    configuración y el mtime del CSV: la entrada de cada etapa queda determinada por
+    ellos, así que no se vuelve a hashear. Sin `cache_key` la etapa se ejecuta sin
+    caché. El resultado se guarda como pickle en STEP_CACHE_DIR.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        if self.cache_key is None:
+            return method(self, *args)
+
+        path = STEP_CACHE_DIR / f'{method.__name__}_{self.cache_key}.pkl'
+
+        if path.exists():
+            try:
+                result = pd.read_pickle(path)
+                path.touch()  # marcar como usada recientemente (LRU)
+                logger.info(f"  ✓ {method.__name__}: resultado cargado desde caché")
+                return result
+            except Exception as e:
+                logger.warning(f"No se pudo leer la caché {path}: {e}")
+
+        result = method(self, *args)
+        try:
+            STEP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            pd.to_pickle(result, path)
+            _evict_step_cache()
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la caché {path}: {e}")
+        return result
+    return wrapper
+
+
+def _quartiles(values: np.ndarray) -> Tuple[float, float]:
+    """
+    Q1 y Q3 con interpolación lineal (mismo resultado que np.nanquantile), usando
+    selección parcial con np.partition (O(n)) en lugar de ordenar la columna.
+    """
+    vals = values[~np.isnan(values)]
+    positions = [(len(vals) - 1) * q for q in (0.25, 0.75)]
+    pivots = sorted({int(np.floor(h)) for h in positions} | {int(np.ceil(h)) for h in positions})
+    vals = np.partition(vals, pivots)
+
+    result = []
+    for h in positions:
+        lo, hi = int(np.floor(h)), int(np.ceil(h))
+        a, b, t = vals[lo], vals[hi], h - lo
+        # Misma fórmula que numpy para evitar diferencias de redondeo
+        result.append(b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t)
+    return result[0], result[1]
+
 
 class DataQualityAnalyzer:
     """
@@ -24,13 +124,16 @@ class DataQualityAnalyzer:
         self.save_dir.mkdir(exist_ok=True)
         self.report = {}
 
-    def analyze(self, df: pd.DataFrame, features: List[str]) -> Dict:
-        """Análisis completo del dataset."""
+    def analyze(self, df: pd.DataFrame, features: List[str], n_columns: Optional[int] = None) -> Dict:
+        """
+        Análisis completo del dataset.
+        `n_columns`: ancho del CSV original, cuando `df` solo trae las columnas proyectadas.
+        """
         logger.info("\n" + "=" * 80)
         logger.info("ANÁLISIS DE CALIDAD DE DATOS")
         logger.info("=" * 80)
 
-        self.report['dataset_shape'] = df.shape
+        self.report['dataset_shape'] = (len(df), df.shape[1] if n_columns is None else n_columns)
         self.report['total_samples'] = len(df)
 
         # Análisis simplificado (los métodos privados ya no son necesarios)
@@ -38,20 +141,20 @@ class DataQualityAnalyzer:
         logger.info(f"  Total muestras: {len(df)}")
         logger.info(f"  Total features: {len(features)}")
 
-        # Missing values
-        missing_info = {}
-        for col in features:
-            if col in df.columns:
-                n_missing = df[col].isna().sum()
-                if n_missing > 0:
-                    missing_info[col] = {'count': int(n_missing), 'percentage': float(n_missing / len(df) * 100)}
+        # Missing values (un único recorrido vectorizado sobre todas las columnas)
+        na_counts = df[[c for c in features if c in df.columns]].isna().sum(axis=0)
+        missing_info = {
+            col: {'count': int(n_missing), 'percentage': float(n_missing / len(df) * 100)}
+            for col, n_missing in na_counts.items() if n_missing > 0
+        }
 
         self.report['missing_values'] = missing_info
 
         # Duplicados
         if 'kepoi_name' in df.columns:
-            koi_counts = df['kepoi_name'].value_counts()
-            duplicated_kois = (koi_counts > 1).sum()
+            # KOIs con >1 observación = nombres distintos entre las repeticiones
+            names = df['kepoi_name']
+            duplicated_kois = names[names.duplicated()].nunique()
             logger.info(f"\n[2] DUPLICADOS")
             logger.info(f"  KOIs con múltiples observaciones: {duplicated_kois}")
             self.report['duplicate_kois'] = int(duplicated_kois)
@@ -62,7 +165,28 @@ class DataQualityAnalyzer:
             logger.warning("  ⚠️  koi_score presente - ALTO RIESGO DE LEAKAGE")
             self.report['leakage_detected'] = True
 
-        # Guardar reporte
+        return self._save()
+
+    def replay(self, report: Dict) -> Dict:
+        """
+        Reporte de un análisis anterior (caché de DataCache): vuelve a escribirlo y a
+        emitir sus avisos, sin recorrer el dataset.
+        """
+        logger.info("\n" + "=" * 80)
+        logger.info("ANÁLISIS DE CALIDAD DE DATOS (desde caché)")
+        logger.info("=" * 80)
+
+        self.report = dict(report)
+        logger.info(f"  Total muestras: {self.report['total_samples']}")
+        if 'duplicate_kois' in self.report:
+            logger.info(f"  KOIs con múltiples observaciones: {self.report['duplicate_kois']}")
+        if self.report.get('leakage_detected'):
+            logger.warning("  ⚠️  koi_score presente - ALTO RIESGO DE LEAKAGE")
+
+        return self._save()
+
+    def _save(self) -> Dict:
+        """Guarda el reporte en diagnostics/data_quality_report.json."""
         report_path = self.save_dir / 'data_quality_report.json'
         with open(report_path, 'w') as f:
             json.dump(self.report, f, indent=2)
@@ -73,14 +197,13 @@ class DataQualityAnalyzer:
 class DataCleaner:
     """Limpieza mejorada con transformaciones."""
 
-    def __init__(self, config: DataConfig):
+    def __init__(self, config: DataConfig, cache_key: Optional[str] = None):
         self.config = config
+        # Clave de DataCache de la ejecución; None desactiva la caché por etapa
+        self.cache_key = cache_key
 
         # Features con data leakage - ELIMINAR
-        self.leakage_features = [
-            'koi_score',           # Score de disposición (0.896 correlación)
-            'koi_pdisposition',    # Preliminary disposition
-        ]
+        self.leakage_features = list(LEAKAGE_FEATURES)
 
         # Features que necesitan log transform
         self.log_transform_features = [
@@ -106,14 +229,25 @@ class DataCleaner:
         # 2. Eliminar duplicados de KOI
         df = self._remove_duplicate_kois(df)
 
+        # Las etapas numéricas trabajan sobre una única matriz float64 (una columna
+        # contigua por feature) y encadenan una máscara de filas a conservar
+        features = [f for f in self.config.required_features + self.config.optional_features
+                    if f in df.columns]
+        feat_index = {f: i for i, f in enumerate(features)}
+        X = np.asfortranarray(df[features].to_numpy(dtype=np.float64))
+
         # 3. Eliminar inconsistencias físicas (más agresivo)
-        df = self._remove_physical_inconsistencies_strict(df)
+        keep = self._remove_physical_inconsistencies_strict(X, feat_index)
 
         # 4. Aplicar transformaciones logarítmicas
-        df = self._apply_log_transforms(df)
+        X = self._apply_log_transforms(X, keep, feat_index)
 
         # 5. Eliminar outliers extremos DESPUÉS de log transform
-        df = self._remove_extreme_outliers_post_transform(df)
+        keep = self._remove_extreme_outliers_post_transform(X, keep, feat_index)
+
+        # Un único indexado de filas al final (take no marca el resultado como vista)
+        df = df.take(np.flatnonzero(keep))
+        df[features] = X[keep]
 
         final_len = len(df)
         removed = initial_len - final_len
@@ -144,13 +278,16 @@ class DataCleaner:
 
         logger.info("\n[2] Eliminando KOIs duplicados...")
 
-        df_sorted = df.copy()
-        df_sorted['_snr_fill'] = df_sorted.get('koi_model_snr', pd.Series([0]*len(df_sorted))).fillna(0)
-
-        df_sorted = df_sorted.sort_values(
+        # Se ordenan solo las claves y el frame se reordena una única vez (sin copia previa)
+        keys = pd.DataFrame({
+            'kepoi_name': df['kepoi_name'].to_numpy(),
+            '_snr_fill': df['koi_model_snr'].fillna(0).to_numpy() if 'koi_model_snr' in df.columns else 0
+        })
+        order = keys.sort_values(
             by=['kepoi_name', '_snr_fill'],
             ascending=[True, False]
-        )
+        ).index.to_numpy()
+        df_sorted = df.take(order)
 
         #before = len(df_sorted)
         #df_dedup = df_sorted.drop_duplicates(subset='kepoi_name', keep='first')
@@ -161,128 +298,340 @@ class DataCleaner:
         #logger.info(f"  Eliminados: {before - after} KOIs duplicados")
         return df_sorted
 
-    def _remove_physical_inconsistencies_strict(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Limpieza estricta de valores físicamente imposibles."""
+    @cached_step
+    def _remove_physical_inconsistencies_strict(self, X: np.ndarray, feat_index: Dict[str, int]) -> np.ndarray:
+        """Limpieza estricta de valores físicamente imposibles. Retorna la máscara de filas válidas."""
         logger.info("\n[3] Eliminando inconsistencias físicas (estricto)...")
 
-        mask = pd.Series([True] * len(df), index=df.index)
+        # Cada regla es una máscara booleana NumPy sobre la columna (NaN nunca es inválido)
+        col = {c: X[:, i] for c, i in feat_index.items()}
+        rules = []
 
         # Período: 0.2 - 730 días (planetas con órbitas hasta 2 años)
-        if 'koi_period' in df.columns:
-            invalid = (df['koi_period'] <= 0.2) | (df['koi_period'] > 730)
-            mask &= ~invalid
-            if invalid.sum() > 0:
-                logger.info(f"  Eliminadas {invalid.sum()} filas con período fuera de [0.2, 730] días")
+        if 'koi_period' in col:
+            rules.append(((col['koi_period'] <= 0.2) | (col['koi_period'] > 730),
+                          "período fuera de [0.2, 730] días"))
 
         # Radio planetario: 0.5 - 30 R_earth (más grande que Júpiter es raro pero posible)
-        if 'koi_prad' in df.columns:
-            invalid = (df['koi_prad'] < 0.5) | (df['koi_prad'] > 30)
-            mask &= ~invalid
-            if invalid.sum() > 0:
-                logger.info(f"  Eliminadas {invalid.sum()} filas con radio fuera de [0.5, 30] R_earth")
+        if 'koi_prad' in col:
+            rules.append(((col['koi_prad'] < 0.5) | (col['koi_prad'] > 30),
+                          "radio fuera de [0.5, 30] R_earth"))
 
         # Profundidad: 10 - 100,000 ppm
-        if 'koi_depth' in df.columns:
-            invalid = (df['koi_depth'] < 10) | (df['koi_depth'] > 100000)
-            mask &= ~invalid
-            if invalid.sum() > 0:
-                logger.info(f"  Eliminadas {invalid.sum()} filas con profundidad fuera de [10, 100k] ppm")
+        if 'koi_depth' in col:
+            rules.append(((col['koi_depth'] < 10) | (col['koi_depth'] > 100000),
+                          "profundidad fuera de [10, 100k] ppm"))
 
         # Temperatura: 100 - 3000 K (rango habitable extendido)
-        if 'koi_teq' in df.columns:
-            invalid = (df['koi_teq'] < 100) | (df['koi_teq'] > 3000)
-            mask &= ~invalid
-            if invalid.sum() > 0:
-                logger.info(f"  Eliminadas {invalid.sum()} filas con temperatura fuera de [100, 3000] K")
+        if 'koi_teq' in col:
+            rules.append(((col['koi_teq'] < 100) | (col['koi_teq'] > 3000),
+                          "temperatura fuera de [100, 3000] K"))
 
         # Radio planeta NO puede ser > radio estrella
-        if {'koi_prad', 'koi_srad'}.issubset(df.columns):
-            invalid = df['koi_prad'] > (df['koi_srad'] * 109.1)  # R_sun to R_earth
-            mask &= ~invalid
-            if invalid.sum() > 0:
-                logger.info(f"  Eliminadas {invalid.sum()} filas con radio planeta > radio estrella")
+        if 'koi_prad' in col and 'koi_srad' in col:
+            rules.append((col['koi_prad'] > (col['koi_srad'] * 109.1),  # R_sun to R_earth
+                          "radio planeta > radio estrella"))
 
-        return df[mask].copy()
+        if not rules:
+            return np.ones(len(X), dtype=bool)
 
-    def _apply_log_transforms(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Aplica transformaciones logarítmicas a features con skew extremo."""
+        if logger.isEnabledFor(logging.INFO):
+            for invalid, description in rules:
+                n_invalid = np.count_nonzero(invalid)
+                if n_invalid > 0:
+                    logger.info(f"  Eliminadas {n_invalid} filas con {description}")
+
+        return ~np.logical_or.reduce([invalid for invalid, _ in rules])
+
+    @cached_step
+    def _apply_log_transforms(self, X: np.ndarray, keep: np.ndarray, feat_index: Dict[str, int]) -> np.ndarray:
+        """Aplica transformaciones logarítmicas a features con skew extremo (in situ sobre X)."""
         logger.info("\n[4] Aplicando transformaciones logarítmicas...")
 
-        for feat in self.log_transform_features:
-            if feat not in df.columns:
-                continue
+        features = [f for f in self.log_transform_features if f in feat_index]
+        if not features:
+            return X
 
-            # Solo transformar valores positivos
-            mask = df[feat] > 0
-            if mask.sum() == 0:
-                continue
+        # Un único bloque para todas las features: una sola pasada de log10
+        cols = [feat_index[f] for f in features]
+        block = X[:, cols]
 
-            # Crear nueva columna log
-            new_col = f'log_{feat}'
-            df[new_col] = np.nan
-            df.loc[mask, new_col] = np.log10(df.loc[mask, feat])
+        # Solo transformar valores positivos; columnas sin ningún positivo (entre las
+        # filas conservadas) se dejan intactas
+        positive = block > 0
+        transformed = positive[keep].any(axis=0)
 
-            # Eliminar columna original
-            df = df.drop(columns=[feat])
+        log_block = np.full_like(block, np.nan)
+        np.log10(block, out=log_block, where=positive)
 
-            # Renombrar log column al nombre original (para compatibilidad)
-            df = df.rename(columns={new_col: feat})
+        # Se mantiene la posición de cada columna (para compatibilidad)
+        X[:, [c for c, t in zip(cols, transformed) if t]] = log_block[:, transformed]
 
+        for feat in (f for f, t in zip(features, transformed) if t):
             logger.info(f"  ✓ Transformado: {feat} → log10({feat})")
 
-        return df
+        return X
 
-    def _remove_extreme_outliers_post_transform(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Elimina outliers extremos DESPUÉS de transformación log."""
+    @cached_step
+    def _remove_extreme_outliers_post_transform(
+        self, X: np.ndarray, keep: np.ndarray, feat_index: Dict[str, int]
+    ) -> np.ndarray:
+        """Elimina outliers extremos DESPUÉS de transformación log. Retorna la máscara actualizada."""
         logger.info("\n[5] Eliminando outliers post-transformación...")
 
-        critical_features = self.config.required_features
-        mask = pd.Series([True] * len(df), index=df.index)
+        # Los cuartiles se calculan solo sobre las filas que siguen vivas
+        features = [f for f in self.config.required_features if f in feat_index]
+        block = X[np.ix_(keep, [feat_index[f] for f in features])]
 
-        for feature in critical_features:
-            if feature not in df.columns:
-                continue
+        # Columnas sin datos no aportan límites
+        has_data = ~np.isnan(block).all(axis=0)
+        features = [f for f, d in zip(features, has_data) if d]
+        block = block[:, has_data]
+        if not features:
+            return keep
 
-            data = df[feature].dropna()
-            if len(data) == 0:
-                continue
+        # Usar 5*IQR (muy permisivo, solo elimina extremos)
+        Q1, Q3 = np.array([_quartiles(block[:, j]) for j in range(block.shape[1])]).T
+        IQR = Q3 - Q1
 
-            # Usar 5*IQR (muy permisivo, solo elimina extremos)
-            Q1 = data.quantile(0.25)
-            Q3 = data.quantile(0.75)
-            IQR = Q3 - Q1
+        lower = Q1 - 5 * IQR
+        upper = Q3 + 5 * IQR
 
-            lower = Q1 - 5 * IQR
-            upper = Q3 + 5 * IQR
+        invalid = (block < lower) | (block > upper)
+        for feature, n_invalid in zip(features, np.count_nonzero(invalid, axis=0)):
+            if n_invalid > 0:
+                logger.info(f"  {feature}: eliminados {n_invalid} outliers extremos")
 
-            invalid = (df[feature] < lower) | (df[feature] > upper)
-            if invalid.sum() > 0:
-                logger.info(f"  {feature}: eliminados {invalid.sum()} outliers extremos")
-                mask &= ~invalid
+        keep = keep.copy()
+        keep[keep] = ~invalid.any(axis=1)
+        return keep
 
-        return df[mask].copy()
+
+class DataCache:
+    """
+    Caché en disco del pipeline de datos.
+
+    Guarda el DataFrame limpio (Parquet), las matrices finales X, y (.npy) y el reporte
+    de calidad del diagnóstico (JSON) bajo una
+    clave derivada de la configuración, del mtime del CSV y del código de limpieza y
+    feature engineering de este módulo, para que ejecuciones repetidas con la misma
+    configuración y el mismo código no vuelvan a parsear ni limpiar el CSV.
+    """
+
+    def __init__(self, config: DataConfig, run_diagnosis: bool, cache_dir: Optional[str] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else CACHE_ROOT / 'cache'
+        self.key = self._build_key(config, run_diagnosis)
+
+    @staticmethod
+    def _build_key(config: DataConfig, run_diagnosis: bool) -> str:
+        """Hash de (versión de formato, código del módulo, config, mtime del CSV, run_diagnosis)."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f'{CACHE_FORMAT_VERSION}:{_pipeline_source_digest()}'.encode())
+        h.update(json.dumps(asdict(config), sort_keys=True, default=str).encode())
+        h.update(str(Path(config.data_path).stat().st_mtime_ns).encode())
+        h.update(str(run_diagnosis).encode())
+        return h.hexdigest()
+
+    @property
+    def frame_path(self) -> Path:
+        return self.cache_dir / f'{self.key}.parquet'
+
+    @property
+    def arrays_path(self) -> Path:
+        return self.cache_dir / f'{self.key}_features.json'
+
+    @property
+    def report_path(self) -> Path:
+        return self.cache_dir / f'{self.key}_report.json'
+
+    def load_report(self) -> Optional[Dict]:
+        """Reporte de DataQualityAnalyzer cacheado, o None si no existe."""
+        if not self.report_path.exists():
+            return None
+        try:
+            with open(self.report_path) as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"No se pudo leer la caché {self.report_path}: {e}")
+            return None
+
+    def save_report(self, report: Dict):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.report_path, 'w') as f:
+                json.dump(report, f)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la caché {self.report_path}: {e}")
+
+    def load_frame(self) -> Optional[pd.DataFrame]:
+        """DataFrame limpio cacheado, o None si no existe."""
+        if not self.frame_path.exists():
+            return None
+        try:
+            df = pd.read_parquet(self.frame_path)
+        except Exception as e:
+            logger.warning(f"No se pudo leer la caché {self.frame_path}: {e}")
+            return None
+        logger.info(f"✓ DataFrame limpio cargado desde caché: {self.frame_path}")
+        return df
+
+    def save_frame(self, df: pd.DataFrame):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(self.frame_path, engine='pyarrow', compression='zstd')
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la caché {self.frame_path}: {e}")
+
+    def load_arrays(self) -> Optional[Tuple[np.ndarray, np.ndarray, List[str]]]:
+        """(X, y, feature_names) cacheados, o None si no existen."""
+        if not self.arrays_path.exists():
+            return None
+        try:
+            with open(self.arrays_path) as f:
+                feature_names = json.load(f)
+            X = np.load(self.cache_dir / f'{self.key}_X.npy')
+            y = np.load(self.cache_dir / f'{self.key}_y.npy')
+        except Exception as e:
+            logger.warning(f"No se pudo leer la caché de X, y: {e}")
+            return None
+        logger.info(f"✓ X, y cargados desde caché: {X.shape[0]} samples, {X.shape[1]} features")
+        return X, y, feature_names
+
+    def save_arrays(self, X: np.ndarray, y: np.ndarray, feature_names: List[str]):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            np.save(self.cache_dir / f'{self.key}_X.npy', X)
+            np.save(self.cache_dir / f'{self.key}_y.npy', y)
+            # El JSON se escribe al final: su existencia marca la entrada como completa
+            with open(self.arrays_path, 'w') as f:
+                json.dump(feature_names, f)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la caché de X, y: {e}")
 
 
 # Resto del código sin cambios...
 class DataLoader:
     """Carga y limpieza de datos."""
 
-    def __init__(self, config: DataConfig):
+    def __init__(self, config: DataConfig, include_leakage: bool = False):
         self.config = config
+        # Cargar también LEAKAGE_FEATURES (para DataQualityAnalyzer y DataCleaner)
+        self.include_leakage = include_leakage
+        # Cabecera completa del CSV (se fija en load): el reporte de calidad describe el
+        # archivo original, no solo las columnas proyectadas
+        self.csv_columns: List[str] = []
 
     def load(self) -> pd.DataFrame:
-        """Carga CSV."""
+        """
+        Carga CSV con solo las columnas usadas y solo filas de clases válidas.
+
+        El filtro por `koi_disposition` y la selección de columnas se aplican durante
+        el escaneo (pyarrow.dataset), sin materializar filas/columnas descartadas.
+        """
         logger.info(f"Cargando {self.config.data_path}")
-        df = pd.read_csv(self.config.data_path, comment='#')
-        logger.info(f"  Cargado: {len(df)} filas")
+        self.n_comments, self.csv_columns = self._scan_header()
+        if pads is None:
+            df = self._load_pandas()
+        elif self.config.csv_block_bytes:
+            df = self._load_arrow_streaming()
+        else:
+            df = self._load_arrow()
+        df = self._encode_classes(df)
+        logger.info(f"  Con clases válidas: {len(df)} filas")
+        return df
+
+    def _column_types(self) -> Dict[str, str]:
+        """Columnas necesarias → tipo ('float' o 'string')."""
+        features = self.config.required_features + self.config.optional_features
+        column_types = {f: 'float' for f in features}
+        column_types.update({'kepoi_name': 'string', 'koi_disposition': 'string'})
+        if self.include_leakage:
+            column_types.update(LEAKAGE_FEATURES)
+        return column_types
+
+    def _scan_header(self) -> Tuple[int, List[str]]:
+        """Cuenta las líneas de comentario ('#') iniciales y devuelve (n_comentarios, cabecera)."""
+        with open(self.config.data_path, newline='') as f:
+            for n_comments, line in enumerate(f):
+                if not line.startswith('#'):
+                    return n_comments, next(csv.reader([line]))
+        raise ValueError(f"{self.config.data_path} no contiene cabecera")
+
+    def _load_arrow(self) -> pd.DataFrame:
+        """Lectura multihilo con pyarrow, con proyección de columnas y filtro de clases en el escaneo."""
+        n_comments, header = self.n_comments, self.csv_columns
+        column_types = self._column_types()
+        columns = [c for c in column_types if c in header]
+        arrow_types = {'float': pa.float64(), 'string': pa.string()}
+
+        csv_format = pads.CsvFileFormat(
+            read_options=pacsv.ReadOptions(skip_rows=n_comments, block_size=8 << 20, use_threads=True),
+            parse_options=pacsv.ParseOptions(delimiter=','),
+            convert_options=pacsv.ConvertOptions(
+                column_types={c: arrow_types[column_types[c]] for c in columns},
+                strings_can_be_null=True
+            )
+        )
+        # La proyección se pasa a to_table (no a include_columns) para que el
+        # escáner la aplique sobre el esquema del dataset
+        dataset = pads.dataset(self.config.data_path, format=csv_format)
+        table = dataset.to_table(
+            columns=columns,
+            filter=pc.field('koi_disposition').isin(list(self.config.class_labels))
+        )
+        return table.to_pandas()
+
+    def _load_arrow_streaming(self) -> pd.DataFrame:
+        """
+        Lectura por bloques con pyarrow (`csv_block_bytes` bytes por bloque).
+
+        Cada RecordBatch se filtra por clase antes de acumularse, de modo que el pico
+        de memoria depende del tamaño de bloque y de las filas válidas, no del archivo.
+        """
+        n_comments, header = self.n_comments, self.csv_columns
+        column_types = self._column_types()
+        columns = [c for c in column_types if c in header]
+        arrow_types = {'float': pa.float64(), 'string': pa.string()}
+        valid_classes = pa.array(list(self.config.class_labels), type=pa.string())
+
+        reader = pacsv.open_csv(
+            self.config.data_path,
+            read_options=pacsv.ReadOptions(
+                skip_rows=n_comments, block_size=self.config.csv_block_bytes, use_threads=True
+            ),
+            parse_options=pacsv.ParseOptions(delimiter=','),
+            convert_options=pacsv.ConvertOptions(
+                column_types={c: arrow_types[column_types[c]] for c in columns},
+                include_columns=columns,
+                strings_can_be_null=True
+            )
+        )
+        batches = [
+            batch.filter(pc.is_in(batch.column('koi_disposition'), value_set=valid_classes))
+            for batch in reader
+        ]
+        return pa.Table.from_batches(batches, schema=reader.schema).to_pandas()
+
+    def _load_pandas(self) -> pd.DataFrame:
+        """Fallback sin pyarrow: pd.read_csv con usecols/dtype y filtro de clases posterior."""
+        column_types = self._column_types()
+        df = pd.read_csv(
+            self.config.data_path,
+            comment='#',
+            usecols=lambda c: c in column_types,
+            dtype={c: (np.float64 if t == 'float' else object) for c, t in column_types.items()}
+        )
         return df
 
-    def filter_classes(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Filtra solo clases válidas."""
-        valid_classes = self.config.class_labels.keys()
-        df_filtered = df[df['koi_disposition'].isin(valid_classes)].copy()
-        logger.info(f"  Con clases válidas: {len(df_filtered)} filas")
-        return df_filtered
+    def _encode_classes(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Convierte `koi_disposition` a categórica con las clases ordenadas por etiqueta.
+        Las disposiciones no válidas quedan como NaN y se descartan; el resto del
+        pipeline trabaja con los códigos enteros en lugar de strings.
+        """
+        classes = sorted(self.config.class_labels, key=self.config.class_labels.get)
+        df['koi_disposition'] = df['koi_disposition'].astype(pd.CategoricalDtype(classes))
+        return df.dropna(subset=['koi_disposition'])
 
 
 class FeatureEngineer:
@@ -291,6 +640,8 @@ class FeatureEngineer:
     def __init__(self, config: DataConfig):
         self.config = config
         self.feature_names = None
+        # Etiqueta → nombre de clase (lookup O(1) al loguear la distribución)
+        self._label_names = {v: k for k, v in self.config.class_labels.items()}
 
     def prepare(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
         """Pipeline completo de preparación."""
@@ -314,21 +665,21 @@ class FeatureEngineer:
     def _impute_optional(self, df: pd.DataFrame) -> pd.DataFrame:
         """Imputa features opcionales."""
         logger.info("\nImputación de valores faltantes:")
-        for col in self.config.optional_features:
-            if col not in df.columns:
-                continue
-
-            if df[col].isna().any():
-                if self.config.imputation_strategy == 'median':
-                    fill_value = df[col].median()
-                elif self.config.imputation_strategy == 'mean':
-                    fill_value = df[col].mean()
-                else:
-                    continue
-
-                n_imputed = df[col].isna().sum()
-                df.loc[:, col] = df[col].fillna(fill_value)  # Fix pandas warning
-                logger.info(f"  {col}: {n_imputed} valores → {self.config.imputation_strategy}={fill_value:.2e}")
+        strategy = self.config.imputation_strategy
+        cols = [c for c in self.config.optional_features if c in df.columns]
+        if strategy not in ('median', 'mean') or not cols:
+            return df
+
+        # Conteos y estadísticos de todas las columnas en una pasada; un único fillna
+        na_counts = df[cols].isna().sum()
+        cols = [c for c in cols if na_counts[c] > 0]
+        if not cols:
+            return df
+        fills = df[cols].median() if strategy == 'median' else df[cols].mean()
+        df[cols] = df[cols].fillna(fills)
+
+        for col in cols:
+            logger.info(f"  {col}: {na_counts[col]} valores → {strategy}={fills[col]:.2e}")
 
         return df
 
@@ -342,7 +693,10 @@ class FeatureEngineer:
         logger.info(f"  {', '.join(available_features)}")
 
         X = df[available_features].values
-        y = df['koi_disposition'].map(self.config.class_labels).values
+        # Códigos de la categórica → etiqueta (tabla indexada, sin lookup por fila en dict)
+        categories = df['koi_disposition'].cat.categories
+        label_table = np.array([self.config.class_labels[c] for c in categories], dtype=np.int64)
+        y = label_table[df['koi_disposition'].cat.codes.to_numpy()]
 
         logger.info(f"\nDataset final: {len(X)} samples, {len(available_features)} features")
 
@@ -353,7 +707,7 @@ class FeatureEngineer:
         unique, counts = np.unique(y, return_counts=True)
         logger.info("\nDistribución de clases:")
         for label_idx, count in zip(unique, counts):
-            label_name = [k for k, v in self.config.class_labels.items() if v == label_idx][0]
+            label_name = self._label_names[label_idx]
             pct = count / len(y) * 100
             logger.info(f"  {label_name}: {count} ({pct:.1f}%)")
 
@@ -430,39 +784,30 @@ def apply_smote_if_enabled(splits: Dict[str, np.ndarray], data_config: DataConfi
         X_train = splits['X_train']
         y_train = splits['y_train']
 
+        # Generador PCG64 sembrado con la semilla de SMOTE (reproducible)
+        rng = np.random.default_rng(getattr(data_config, 'smote_random_state', 42))
+
         # calcular conteos por clase
         unique, counts = np.unique(y_train, return_counts=True)
         max_count = counts.max()
 
-        X_res_list = []
-        y_res_list = []
-        for cls in unique:
-            cls_mask = (y_train == cls)
-            X_cls = X_train[cls_mask]
-            y_cls = y_train[cls_mask]
-
-            if len(y_cls) == 0:
-                continue
-
-            if len(y_cls) < max_count:
-                # resample with replacement
-                idx = np.random.randint(0, len(y_cls), size=(max_count,))
-                X_up = X_cls[idx]
-                y_up = y_cls[idx]
-            else:
-                X_up = X_cls
-                y_up = y_cls
-
-            X_res_list.append(X_up)
-            y_res_list.append(y_up)
-
-        X_res = np.vstack(X_res_list)
-        y_res = np.hstack(y_res_list)
-
-        # mezclar
-        perm = np.random.permutation(len(y_res))
-        splits['X_train'] = X_res[perm]
-        splits['y_train'] = y_res[perm]
+        # Tras un único argsort estable cada clase es un bloque contiguo [start, end)
+        # de `order`; las clases con max_count muestras se conservan tal cual.
+        order = np.argsort(y_train, kind='stable')
+        starts = np.searchsorted(y_train[order], unique)
+        ends = np.r_[starts[1:], len(order)]
+        gather = np.concatenate([
+            order[start + rng.integers(0, end - start, size=max_count, dtype=np.int64)]
+            if end - start < max_count else order[start:end]
+            for start, end in zip(starts, ends)
+        ])
+
+        # mezclar y copiar las filas una sola vez
+        gather = gather[rng.permutation(len(gather))]
+        X_res = np.empty((len(gather), X_train.shape[1]), dtype=X_train.dtype)
+        np.take(X_train, gather, axis=0, out=X_res)
+        splits['X_train'] = X_res
+        splits['y_train'] = y_train[gather]
 
         logger.info(f"  Antes oversampling: {len(y_train)} muestras; Después oversampling: {len(splits['y_train'])} muestras")
         return splits
@@ -471,9 +816,11 @@ def apply_smote_if_enabled(splits: Dict[str, np.ndarray], data_config: DataConfi
     y_train = splits['y_train']
 
     logger.info("Aplicando SMOTE al conjunto de entrenamiento...")
+    # Búsqueda de vecinos multihilo (mismo resultado que k_neighbors=int, que usa un solo hilo)
+    k_neighbors = getattr(data_config, 'smote_k_neighbors', 5)
     smote = SMOTE(
         sampling_strategy=getattr(data_config, 'smote_sampling_strategy', 'auto'),
-        k_neighbors=getattr(data_config, 'smote_k_neighbors', 5),
+        k_neighbors=NearestNeighbors(n_neighbors=k_neighbors + 1, n_jobs=-1),
         random_state=getattr(data_config, 'smote_random_state', 42)
     )
 
@@ -507,24 +854,48 @@ def load_and_prepare_data(
         from config import DATA_CONFIG
         data_config = DATA_CONFIG
 
-    # Load
-    loader = DataLoader(data_config)
-    df = loader.load()
-    df = loader.filter_classes(df)
-
-    # Diagnosis
-    if run_diagnosis:
-        all_features = data_config.required_features + data_config.optional_features
-        analyzer = DataQualityAnalyzer()
-        diagnosis = analyzer.analyze(df, all_features)
-
-        # Clean con mejoras
-        cleaner = DataCleaner(data_config)
-        df = cleaner.clean(df, diagnosis)
-
-    # Engineer
-    engineer = FeatureEngineer(data_config)
-    X, y = engineer.prepare(df)
+    cache = DataCache(data_config, run_diagnosis) if data_config.use_cache else None
+
+    # Con diagnóstico, lo cacheado solo se reutiliza junto con su reporte de calidad,
+    # que se vuelve a escribir y a avisar (leakage) como si se hubiera analizado el CSV
+    report = cache.load_report() if cache and run_diagnosis else None
+    reuse = cache is not None and (report is not None or not run_diagnosis)
+    cached = cache.load_arrays() if reuse else None
+    df = cache.load_frame() if reuse and cached is None else None
+    if report is not None and (cached is not None or df is not None):
+        DataQualityAnalyzer().replay(report)
+
+    if cached is not None:
+        X, y, feature_names = cached
+    else:
+        if df is None:
+            # Load
+            # Las columnas con leakage solo se cargan si se van a diagnosticar y eliminar
+            loader = DataLoader(data_config, include_leakage=run_diagnosis)
+            df = loader.load()
+
+            # Diagnosis
+            if run_diagnosis:
+                all_features = data_config.required_features + data_config.optional_features
+                analyzer = DataQualityAnalyzer()
+                diagnosis = analyzer.analyze(df, all_features, n_columns=len(loader.csv_columns))
+                if cache:
+                    cache.save_report(diagnosis)
+
+                # Clean con mejoras
+                cleaner = DataCleaner(data_config, cache_key=cache.key if cache else None)
+                df = cleaner.clean(df, diagnosis)
+
+            if cache:
+                cache.save_frame(df)
+
+        # Engineer
+        engineer = FeatureEngineer(data_config)
+        X, y = engineer.prepare(df)
+        feature_names = engineer.feature_names
+
+        if cache:
+            cache.save_arrays(X, y, feature_names)
 
     # Split
     splitter = DataSplitter(data_config)
@@ -533,4 +904,4 @@ def load_and_prepare_data(
     # Aplicar SMOTE al entrenamiento si está activado en la configuración
     splits = apply_smote_if_enabled(splits, data_config)
 
-    return splits, engineer.feature_names
\ No newline at end of file
+    return splits, feature_names
\ No newline at end of file
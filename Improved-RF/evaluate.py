@@ -3,14 +3,21 @@ Evaluación y visualización de resultados.
 """
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+import matplotlib
+matplotlib.use('Agg', force=True)  # Solo se guardan PNGs: sin backend interactivo
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import seaborn as sns
 from sklearn.metrics import (
     classification_report, confusion_matrix,
     f1_score, accuracy_score, precision_score, recall_score
 )
-from sklearn.model_selection import cross_val_score  # ← FIX: Movido aquí
+from sklearn.base import clone
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.model_selection import cross_val_score, StratifiedKFold  # ← FIX: Movido aquí
 from pathlib import Path
+from operator import itemgetter
+import hashlib
 import logging
 from typing import Dict, Optional
 
@@ -37,6 +44,11 @@ class ModelEvaluator:
         self.eval_config = eval_config
         self.data_config = data_config
 
+        # Nombres de clase ordenados por etiqueta (se calculan una sola vez)
+        self._label_names = tuple(
+            k for k, _ in sorted(self.data_config.class_labels.items(), key=itemgetter(1))
+        )
+
         # Crear directorio de salida
         Path(self.eval_config.output_dir).mkdir(exist_ok=True)
 
@@ -59,11 +71,7 @@ class ModelEvaluator:
         self._log_metrics(metrics)
 
         # Classification report
-        label_names = [k for k, v in sorted(
-            self.data_config.class_labels.items(),
-            key=lambda x: x[1]
-        )]
-        report = classification_report(y_true, y_pred, target_names=label_names)
+        report = classification_report(y_true, y_pred, target_names=list(self._label_names))
         logger.info(f"\n{report}")
 
         return metrics, y_pred
@@ -94,26 +102,34 @@ class ModelEvaluator:
         if not self.eval_config.plot_confusion_matrix:
             return
 
+        save_path = Path(self.eval_config.output_dir) / filename
+        digest = self._plot_digest(y_true, y_pred, list(self.data_config.class_labels))
+        if self._plot_is_current(save_path, digest):
+            logger.info(f"  Confusion matrix sin cambios: {save_path}")
+            return
+
         cm = confusion_matrix(y_true, y_pred)
         cm_normalized = cm.astype('float') / cm.sum(axis=1)[:, np.newaxis]
 
-        plt.figure(figsize=(12, 10))
+        fig = Figure(figsize=(12, 10))
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
         sns.heatmap(
             cm_normalized,
             annot=True,
             fmt='.2%',
             cmap='Blues',
             xticklabels=list(self.data_config.class_labels.keys()),
-            yticklabels=list(self.data_config.class_labels.keys())
+            yticklabels=list(self.data_config.class_labels.keys()),
+            ax=ax
         )
-        plt.title('Confusion Matrix', fontsize=14, fontweight='bold')
-        plt.ylabel('True Label')
-        plt.xlabel('Predicted Label')
-        plt.tight_layout()
+        ax.set_title('Confusion Matrix', fontsize=14, fontweight='bold')
+        ax.set_ylabel('True Label')
+        ax.set_xlabel('Predicted Label')
+        fig.tight_layout()
 
-        save_path = Path(self.eval_config.output_dir) / filename
-        plt.savefig(save_path, dpi=300)
-        plt.close()
+        fig.savefig(save_path, dpi=self.eval_config.plot_dpi)
+        self._write_plot_digest(save_path, digest)
         logger.info(f"  Confusion matrix guardada: {save_path}")
 
     def plot_feature_importance(
@@ -126,9 +142,14 @@ class ModelEvaluator:
         if not self.eval_config.plot_feature_importance:
             return
 
+        feature_importances = model.get_feature_importances()
+        if feature_importances is None:
+            logger.info("\nFeature importance no disponible para este modelo")
+            return
+
         importances = pd.DataFrame({
             'feature': feature_names,
-            'importance': model.get_feature_importances()
+            'importance': feature_importances
         }).sort_values('importance', ascending=False)
 
         logger.info("\nFeature Importance (Top 10):")
@@ -136,31 +157,74 @@ class ModelEvaluator:
             logger.info(f"  {row['feature']}: {row['importance']:.4f}")
 
         # Plot
-        plt.figure(figsize=(10, 8))
         top_n = min(self.eval_config.top_n_features, len(importances))
-        top_features = importances.head(top_n)
-        plt.barh(range(len(top_features)), top_features['importance'])
-        plt.yticks(range(len(top_features)), top_features['feature'])
-        plt.xlabel('Importance')
-        plt.title(f'Top {top_n} Feature Importance', fontsize=14, fontweight='bold')
-        plt.gca().invert_yaxis()
-        plt.tight_layout()
-
         save_path = Path(self.eval_config.output_dir) / filename
-        plt.savefig(save_path, dpi=300)
-        plt.close()
+        digest = self._plot_digest(importances['importance'].to_numpy(), list(importances['feature']), top_n)
+        if self._plot_is_current(save_path, digest):
+            logger.info(f"  Feature importance sin cambios: {save_path}")
+            return
+
+        fig = Figure(figsize=(10, 8))
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        top_features = importances.head(top_n)
+        ax.barh(range(len(top_features)), top_features['importance'])
+        ax.set_yticks(range(len(top_features)), top_features['feature'])
+        ax.set_xlabel('Importance')
+        ax.set_title(f'Top {top_n} Feature Importance', fontsize=14, fontweight='bold')
+        ax.invert_yaxis()
+        fig.tight_layout()
+
+        fig.savefig(save_path, dpi=self.eval_config.plot_dpi)
+        self._write_plot_digest(save_path, digest)
         logger.info(f"  Feature importance guardada: {save_path}")
 
+    def _plot_digest(self, *inputs) -> str:
+        """Hash de las entradas de un gráfico (y de la resolución de salida)."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(str(self.eval_config.plot_dpi).encode())
+        for value in inputs:
+            if isinstance(value, np.ndarray):
+                value = np.ascontiguousarray(value)
+                h.update(f'{value.dtype}{value.shape}'.encode())
+                h.update(memoryview(value).cast('B'))
+            else:
+                h.update(repr(value).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def _plot_is_current(save_path: Path, digest: str) -> bool:
+        """True si el PNG existe y su `.hash` coincide: no hace falta volver a renderizar."""
+        hash_path = save_path.with_name(save_path.name + '.hash')
+        return save_path.exists() and hash_path.exists() and hash_path.read_text() == digest
+
+    @staticmethod
+    def _write_plot_digest(save_path: Path, digest: str):
+        save_path.with_name(save_path.name + '.hash').write_text(digest)
+
     def cross_validate(self, model, X: np.ndarray, y: np.ndarray) -> np.ndarray:
         """Cross-validation."""
         logger.info(f"\nCross-Validation ({self.eval_config.cv_folds}-fold)...")
 
-        # Rebuild model para CV
-        model.build()
+        # Estimador sin entrenar con los mismos hiperparámetros: no se toca el modelo
+        # ya entrenado. Los folds se reparten entre procesos y cada RF usa un solo hilo
+        # para no sobresuscribir los núcleos (n_jobs=-1 en ambos niveles).
+        if model.model is None:
+            model.build()
+        estimator = clone(model.model)
+        if 'n_jobs' in estimator.get_params():
+            estimator.set_params(n_jobs=1)
+
+        # El RF convierte X a float32 en cada fold; se convierte una vez. Otros backends
+        # (HistGBM) reciben float64, como en el ajuste final y en predict.py (input_dtype).
+        # joblib pasa los arrays grandes a los workers como memmap en lugar de copiarlos.
+        if isinstance(estimator, (RandomForestClassifier, ExtraTreesClassifier)):
+            X = np.ascontiguousarray(X, dtype=np.float32)
+        cv = StratifiedKFold(n_splits=self.eval_config.cv_folds)
 
         scores = cross_val_score(
-            model.model, X, y,
-            cv=self.eval_config.cv_folds,
+            estimator, X, y,
+            cv=cv,
             scoring='f1_macro',
             n_jobs=-1
         )
@@ -1,13 +1,19 @@
 """
-Wrapper del modelo Random Forest.
+Wrappers de modelos (Random Forest y HistGradientBoosting).
 """
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.utils.class_weight import compute_sample_weight
 import numpy as np
 import logging
 from typing import Optional
 from pathlib import Path
 import joblib
 
+try:
+    import lz4
+except ImportError:  # lz4 es opcional: solo se usa si save_compress lo pide
+    lz4 = None
+
 from config import ModelConfig
 
 logger = logging.getLogger(__name__)
@@ -46,10 +52,31 @@ class ExoplanetRandomForest:
             self.build()
 
         logger.info("Entrenando modelo...")
-        self.model.fit(X_train, y_train)
+        class_weight = self.model.get_params().get('class_weight')
+        if class_weight == 'balanced':
+            # Pesos por muestra calculados una vez (equivalente a class_weight='balanced');
+            # el estimador conserva class_weight='balanced' para clones/CV
+            sample_weight = compute_sample_weight('balanced', y_train)
+            self.model.set_params(class_weight=None)
+            try:
+                self._fit(X_train, y_train, sample_weight=sample_weight)
+            finally:
+                self.model.set_params(class_weight=class_weight)
+        else:
+            self._fit(X_train, y_train)
         self.is_trained = True
         logger.info("  Entrenamiento completado")
 
+    def _fit(self, X_train: np.ndarray, y_train: np.ndarray, **fit_params):
+        """Ajusta el estimador con el backend 'threading' de joblib.
+
+        Los árboles liberan el GIL durante el ajuste, así que con hilos cada árbol
+        entrenado se queda en memoria compartida en lugar de serializarse de vuelta
+        desde un proceso worker (loky), aunque el contexto externo lo imponga.
+        """
+        with joblib.parallel_backend('threading', n_jobs=self.config.n_jobs):
+            self.model.fit(X_train, y_train, **fit_params)
+
     def predict(self, X: np.ndarray) -> np.ndarray:
         """Predice clases."""
         if not self.is_trained:
@@ -80,7 +107,14 @@ class ExoplanetRandomForest:
         if extra:
             payload.update(extra)
 
-        joblib.dump(payload, p)
+        # Sin compresión (por defecto) los arrays se leen tal cual al cargar; la
+        # compresión reduce el archivo a cambio de descomprimir en cada carga
+        compress = self.config.save_compress
+        if isinstance(compress, tuple) and compress[0] == 'lz4' and lz4 is None:
+            logger.warning("lz4 no está instalado: el modelo se guarda sin comprimir")
+            compress = 0
+
+        joblib.dump(payload, p, compress=compress, protocol=5)
         logger.info(f"Modelo guardado en: {p}")
 
     def load(self, path: str):
@@ -93,4 +127,53 @@ class ExoplanetRandomForest:
         self.model = payload.get('model', payload)
         self.is_trained = True
         logger.info(f"Modelo cargado desde: {p}")
-        return payload
\ No newline at end of file
+        return payload
+
+class ExoplanetHistGBM(ExoplanetRandomForest):
+    """
+    HistGradientBoosting con la misma interfaz que ExoplanetRandomForest.
+
+    Menos árboles y poco profundos sobre features discretizadas en bins: inferencia
+    bastante más rápida que el RF de 200 árboles de profundidad 15.
+    """
+
+    def build(self):
+        """Construye el modelo."""
+        self.model = HistGradientBoostingClassifier(
+            max_iter=self.config.hgb_max_iter,
+            max_depth=self.config.hgb_max_depth,
+            learning_rate=self.config.hgb_learning_rate,
+            early_stopping=self.config.hgb_early_stopping,
+            min_samples_leaf=self.config.min_samples_leaf,
+            class_weight=self.config.class_weight,
+            random_state=self.config.random_state,
+            verbose=self.config.verbose
+        )
+        logger.info("Modelo HistGradientBoosting construido")
+
+    def get_feature_importances(self) -> Optional[np.ndarray]:
+        """HistGradientBoosting no expone feature importances (impurity-based)."""
+        if not self.is_trained:
+            raise RuntimeError("Modelo no entrenado")
+        return None
+
+
+MODEL_BACKENDS = {
+    'random_forest': ExoplanetRandomForest,
+    'hist_gbm': ExoplanetHistGBM,
+}
+
+
+def create_model(config: Optional[ModelConfig] = None) -> ExoplanetRandomForest:
+    """Instancia el wrapper correspondiente a `config.backend`."""
+    if config is None:
+        from config import MODEL_CONFIG
+        config = MODEL_CONFIG
+
+    try:
+        model_cls = MODEL_BACKENDS[config.backend]
+    except KeyError:
+        raise ValueError(
+            f"Backend desconocido: {config.backend!r} (opciones: {', '.join(MODEL_BACKENDS)})"
+        ) from None
+    return model_cls(config)
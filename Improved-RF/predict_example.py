@@ -20,6 +20,12 @@ import joblib
 import pandas as pd
 import numpy as np
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # pyarrow es opcional: se usa pd.read_csv como fallback
+    pa = pacsv = None
+
 
 def load_model(path: Path):
     if not path.exists():
@@ -38,12 +44,46 @@ def load_model(path: Path):
     return model, feature_names, class_labels
 
 
+def _same_as_pandas(column_type) -> bool:
+    """Tipos que `to_pandas` deja igual que pd.read_csv (int64, float64, bool, object)."""
+    return (pa.types.is_int64(column_type) or pa.types.is_float64(column_type)
+            or pa.types.is_boolean(column_type) or pa.types.is_string(column_type))
+
+
+def read_input_csv(path: Path) -> pd.DataFrame:
+    """Lee el CSV de entrada con el lector multihilo de pyarrow si está disponible.
+
+    Si pyarrow infiere algún tipo que pandas no produciría (fechas, columnas vacías) o hay
+    cabeceras repetidas, se recurre a pd.read_csv para conservar el resultado de siempre.
+    """
+    if pacsv is None:
+        return pd.read_csv(path)
+    try:
+        table = pacsv.read_csv(path, convert_options=pacsv.ConvertOptions(strings_can_be_null=True))
+    except pa.ArrowInvalid:
+        return pd.read_csv(path)
+    if (len(set(table.column_names)) != table.num_columns
+            or not all(_same_as_pandas(field.type) for field in table.schema)):
+        return pd.read_csv(path)
+    return table.to_pandas()
+
+
 def build_dummy_df(feature_names, n_rows=1):
     # Construye un DataFrame dummy con ceros para cada feature
     data = {f: [0.0] * n_rows for f in feature_names}
     return pd.DataFrame(data)
 
 
+def predict_proba_if_available(model, X):
+    """Probabilidades por clase, o None si el modelo no las ofrece (o falla al calcularlas)."""
+    if not (hasattr(model, 'predict_proba') and hasattr(model, 'classes_')):
+        return None
+    try:
+        return model.predict_proba(X)
+    except Exception:
+        return None
+
+
 def reverse_class_map(class_labels: dict):
     if class_labels is None:
         return None
@@ -72,20 +112,20 @@ def main():
         if not input_path.exists():
             print(f"ERROR: archivo de entrada no encontrado: {input_path}")
             sys.exit(1)
-        df = pd.read_csv(input_path)
+        df = read_input_csv(input_path)
         if feature_names is not None:
             missing = [f for f in feature_names if f not in df.columns]
             if missing:
                 print(f"ERROR: el CSV de entrada no contiene las columnas requeridas por el modelo: {missing}")
                 sys.exit(1)
-            X = df[feature_names].values
+            X = df[feature_names]
         else:
             # Si no tenemos feature_names guardadas, asumimos que todas las columnas numéricas son features
             numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
             if not numeric_cols:
                 print("ERROR: no se detectaron columnas numéricas en el CSV de entrada y no hay feature_names en el modelo.")
                 sys.exit(1)
-            X = df[numeric_cols].values
+            X = df[numeric_cols]
             feature_names = numeric_cols
     else:
         # Crear dummy
@@ -96,21 +136,18 @@ def main():
         X = df.values
         print(f"Se creó un dataset dummy de {len(df)} fila(s) con features: {feature_names}")
 
-    # Predecir
+    # Predecir sobre una única matriz contigua en el dtype interno del modelo: los árboles de
+    # un Random Forest comparan en float32; HistGradientBoosting necesita float64.
+    # Con probabilidades disponibles basta una pasada por el modelo: la clase predicha es
+    # la de mayor probabilidad (lo mismo que calcula `predict` internamente)
     try:
-        y_pred = model.predict(X)
+        X = np.ascontiguousarray(X, dtype=np.float32 if hasattr(model, 'estimators_') else np.float64)
+        proba = predict_proba_if_available(model, X)
+        y_pred = model.classes_[np.argmax(proba, axis=1)] if proba is not None else model.predict(X)
     except Exception as e:
         print(f"ERROR durante la predicción: {e}")
         sys.exit(1)
 
-    # Probabilidades si están disponibles
-    proba = None
-    if hasattr(model, 'predict_proba'):
-        try:
-            proba = model.predict_proba(X)
-        except Exception:
-            proba = None
-
     # Mapear etiquetas a nombres humanos
     rev_map = reverse_class_map(class_labels)
     if rev_map:
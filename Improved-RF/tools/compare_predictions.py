@@ -4,6 +4,7 @@ Genera:
  - results/large_compare_report.txt: resumen (n, matches, mismatches, accuracy simple)
  - results/large_mismatches.csv: filas donde difieren (incluye expected y predicted y razones)
 """
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
@@ -22,35 +23,35 @@ if not exp_path.exists():
 pred = pd.read_csv(pred_path)
 exp = pd.read_csv(exp_path)
 
-# Ensure we have a common index: row in expected corresponds to row order
-# Align by position: add a 1-based row index to pred
-pred = pred.reset_index(drop=True)
-exp = exp.reset_index(drop=True)
-
-# Use expected row numbers to align (expected 'row' column starts at 1)
-# We'll compare by position: first expected row <-> first prediction row
+# Compare by position: first expected row <-> first prediction row
 n = min(len(pred), len(exp))
+pred = pred.head(n).reset_index(drop=True)
+exp = exp.head(n).reset_index(drop=True)
+
+def label_idx(df, column):
+    """Columna de índices de clase como int; None por fila si el CSV no la trae."""
+    if column in df.columns:
+        return df[column].astype(int)
+    return pd.Series([None] * len(df), dtype=object)
 
-rows = []
-matches = 0
-for i in range(n):
-    pred_idx = int(pred.loc[i, 'pred_label_idx']) if 'pred_label_idx' in pred.columns else None
-    # expected may have expected_label_idx
-    exp_idx = int(exp.loc[i, 'expected_label_idx']) if 'expected_label_idx' in exp.columns else None
-    match = (pred_idx == exp_idx)
-    if match:
-        matches += 1
-    rows.append({
-        'row': i+1,
-        'expected_label': exp.loc[i, 'expected_label'],
-        'expected_label_idx': exp_idx,
-        'pred_label': pred.loc[i, 'pred_label'] if 'pred_label' in pred.columns else str(pred_idx),
-        'pred_label_idx': pred_idx,
-        'match': match,
-        'reason': exp.loc[i, 'reason'] if 'reason' in exp.columns else ''
-    })
+pred_idx = label_idx(pred, 'pred_label_idx')
+# expected may have expected_label_idx
+exp_idx = label_idx(exp, 'expected_label_idx')
+if pred_idx.dtype == object and exp_idx.dtype == object:
+    match = pd.Series(True, index=pred.index)  # sin índices en ninguno de los dos: None == None
+else:
+    match = pred_idx == exp_idx
+matches = int(match.sum())
 
-df_rows = pd.DataFrame(rows)
+df_rows = pd.DataFrame({
+    'row': np.arange(1, n + 1),
+    'expected_label': exp['expected_label'],
+    'expected_label_idx': exp_idx,
+    'pred_label': pred['pred_label'] if 'pred_label' in pred.columns else pred_idx.astype(str),
+    'pred_label_idx': pred_idx,
+    'match': match,
+    'reason': exp['reason'] if 'reason' in exp.columns else '',
+})
 accuracy = matches / n if n>0 else 0.0
 
 Path('results').mkdir(parents=True, exist_ok=True)
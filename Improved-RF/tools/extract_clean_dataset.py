@@ -28,19 +28,20 @@ if 'koi_disposition' in df.columns:
     df = df[df['koi_disposition'].isin(valid)].copy()
     print(f"Filas después de filtrar clases válidas: {len(df)}")
 
-# Asegurarnos de que la columna koi_model_snr esté presente para ordenar
+# Asegurarnos de que la columna koi_model_snr esté presente para elegir duplicados
 if 'koi_model_snr' not in df.columns:
     df['koi_model_snr'] = 0.0
 
-# Ordenar por kepoi_name y koi_model_snr desc para mantener mejor SNR
+# Mantener por kepoi_name la fila de mayor koi_model_snr (la primera en caso de empate):
+# agregación por hash en lugar de ordenar todo el DataFrame. sort=True conserva el orden
+# de salida por nombre y dropna=False la fila sin nombre, como el antiguo sort + drop_duplicates
 if 'kepoi_name' in df.columns:
-    df['_snr_fill'] = df['koi_model_snr'].fillna(0)
-    df = df.sort_values(by=['kepoi_name', '_snr_fill'], ascending=[True, False])
+    snr = df['koi_model_snr'].fillna(0)
+    best = snr.groupby(df['kepoi_name'], sort=True, dropna=False).idxmax()
     before = len(df)
-    df = df.drop_duplicates(subset='kepoi_name', keep='first')
+    df = df.loc[best.to_numpy()]
     after = len(df)
     print(f"Duplicados removidos por 'kepoi_name': {before - after}")
-    df = df.drop(columns=['_snr_fill'])
 else:
     print("Advertencia: columna 'kepoi_name' no encontrada; no se eliminarán duplicados por nombre.")
 
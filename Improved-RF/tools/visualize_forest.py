@@ -8,6 +8,7 @@ Uso:
 
 """
 import argparse
+import hashlib
 from pathlib import Path
 import joblib
 import matplotlib
@@ -28,6 +29,25 @@ def load_model(path: Path):
     return model, feature_names
 
 
+def file_digest(path: Path) -> str:
+    """Hash del contenido del modelo: los PNG solo dependen de él y de los argumentos."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def plot_is_current(out_path: Path, digest: str) -> bool:
+    """True si el PNG existe y su `.hash` coincide: no hace falta volver a renderizar."""
+    hash_path = out_path.with_name(out_path.name + '.hash')
+    return out_path.exists() and hash_path.exists() and hash_path.read_text() == digest
+
+
+def write_plot_digest(out_path: Path, digest: str):
+    out_path.with_name(out_path.name + '.hash').write_text(digest)
+
+
 def plot_feature_importance(model, feature_names, out_path: Path):
     fi = model.feature_importances_
     if feature_names is None:
@@ -74,21 +94,43 @@ def main():
     out_dir = Path(args.output_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
+    # Los gráficos son deterministas para un mismo modelo y argumentos: cada PNG guarda
+    # un `.hash` al lado y solo se vuelve a renderizar si cambia
+    model_digest = file_digest(model_path)
+    fi_path = out_dir / 'feature_importance_rf.png'
+    fi_digest = model_digest
+    tree_paths = [out_dir / f'tree_{i}.png' for i in range(args.n_trees)]
+    tree_digest = f'{model_digest}-depth{args.max_depth}'
+
+    if plot_is_current(fi_path, fi_digest) and all(plot_is_current(p, tree_digest) for p in tree_paths):
+        # Nada que renderizar: ni siquiera hace falta cargar el modelo
+        print(f'Feature importance sin cambios: {fi_path}')
+        for i, tree_path in enumerate(tree_paths):
+            print(f'Tree {i} sin cambios: {tree_path}')
+        return
+
     model, feature_names = load_model(model_path)
     if not hasattr(model, 'feature_importances_'):
         raise RuntimeError('El modelo cargado no parece ser un RandomForest con feature_importances_')
 
     # Feature importance
-    fi_path = out_dir / 'feature_importance_rf.png'
-    plot_feature_importance(model, feature_names, fi_path)
-    print(f'Feature importance guardada en: {fi_path}')
+    if plot_is_current(fi_path, fi_digest):
+        print(f'Feature importance sin cambios: {fi_path}')
+    else:
+        plot_feature_importance(model, feature_names, fi_path)
+        write_plot_digest(fi_path, fi_digest)
+        print(f'Feature importance guardada en: {fi_path}')
 
     # Seleccionar índices de árboles a plotear (e.g., primeros n)
     n = min(args.n_trees, len(getattr(model, 'estimators_', [])))
     for i in range(n):
+        tree_path = tree_paths[i]
+        if plot_is_current(tree_path, tree_digest):
+            print(f'Tree {i} sin cambios: {tree_path}')
+            continue
         dt = model.estimators_[i]
-        tree_path = out_dir / f'tree_{i}.png'
         plot_tree_png(dt, feature_names, tree_path, max_depth=args.max_depth)
+        write_plot_digest(tree_path, tree_digest)
         print(f'Tree {i} guardado en: {tree_path}')
 
 if __name__ == '__main__':
@@ -7,7 +7,7 @@ from typing import Optional
 from config import DataConfig, ModelConfig, EvaluationConfig
 from pathlib import Path
 from data import load_and_prepare_data
-from model import ExoplanetRandomForest
+from model import create_model
 from evaluate import ModelEvaluator
 import numpy as np
 
@@ -42,7 +42,7 @@ def train_and_evaluate(
     logger.info("\n" + "=" * 60)
     logger.info("ENTRENANDO MODELO")
     logger.info("=" * 60)
-    model = ExoplanetRandomForest(model_config)
+    model = create_model(model_config)
     model.train(splits['X_train'], splits['y_train'])
 
     # Guardar modelo entrenado con metadata
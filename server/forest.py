@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Compact float32 export of the trained RandomForest for inference.
+
+scikit-learn keeps every tree as float64 thresholds and float64 class counts per
+node. Inference only needs float32: the forest casts X to float32 anyway, so a
+float32 threshold rounded towards -inf takes exactly the same branch as the
+float64 one. The export is written once next to ``model.joblib`` and reused
+until the model file changes.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+
+LEAF = -1
+
+# Samples per traversal block: 256 samples x 200 trees keeps each per-step buffer
+# around 200 KB, so a step's gathers and compares stay in cache
+BLOCK_ROWS = 256
+
+
+def _float32_thresholds(threshold: np.ndarray) -> np.ndarray:
+    """Largest float32 <= each float64 threshold, so ``x <= t32`` iff ``x <= t64`` for float32 x."""
+    rounded = threshold.astype(np.float32)
+    above = rounded.astype(np.float64) > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+# Node fields of the export, each stored as its own contiguous array
+NODE_FIELDS = ("feature", "threshold", "missing_right", "children")
+
+
+def _level_order(left: np.ndarray, right: np.ndarray, roots: np.ndarray) -> np.ndarray:
+    """Permutation listing the nodes of all trees level by level: every root, then every
+    depth-1 node, and so on, in tree order within a level."""
+    depth = np.empty(len(left), dtype=np.int64)
+    frontier, level = roots, 0
+    while frontier.size:
+        depth[frontier] = level
+        children = np.concatenate([left[frontier], right[frontier]])
+        frontier, level = children[children != LEAF], level + 1
+    return np.lexsort((np.arange(len(left)), depth))
+
+
+class CompactForest:
+    """Nodes of all trees as parallel arrays (one per field) plus per-node class probabilities.
+
+    Nodes are laid out level by level across trees, so traversal step ``d`` gathers
+    from the band of depth-``d`` nodes instead of from the whole forest.
+    """
+
+    def __init__(
+        self, nodes: dict, values: np.ndarray, roots: np.ndarray, classes: np.ndarray, max_depth: int
+    ) -> None:
+        # int32 like the index buffer it is gathered into during traversal
+        self.feature = nodes["feature"].astype(np.int32, copy=False)
+        self.threshold = nodes["threshold"]
+        self.missing_right = nodes["missing_right"]
+        # (n_nodes, 2): column 0 is the left child, column 1 the right one
+        self.children = nodes["children"]
+        self.values = values
+        self.roots = roots
+        self.classes = classes
+        self.max_depth = max_depth
+
+    @property
+    def nodes(self) -> dict:
+        return {field: getattr(self, field) for field in NODE_FIELDS}
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> "CompactForest":
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        def stacked(field: str) -> np.ndarray:
+            return np.concatenate([getattr(tree, field) for tree in trees])
+
+        # Child indices made global across the concatenated trees; leaves keep LEAF
+        left, right = stacked("children_left"), stacked("children_right")
+        is_leaf = left == LEAF
+        tree_offset = np.repeat(offsets, sizes)
+        left = np.where(is_leaf, LEAF, left + tree_offset)
+        right = np.where(is_leaf, LEAF, right + tree_offset)
+
+        order = _level_order(left, right, offsets)
+        new_index = np.empty_like(order)
+        new_index[order] = np.arange(len(order))
+
+        # Leaves point back to themselves: a walk of max_depth steps always ends
+        # on the right leaf, whatever the depth of the path
+        own_index = np.arange(len(order))
+        children = np.empty((len(order), 2), dtype=np.int32)
+        children[:, 0] = np.where(is_leaf[order], own_index, new_index[left[order]])
+        children[:, 1] = np.where(is_leaf[order], own_index, new_index[right[order]])
+        nodes = {
+            "feature": np.where(is_leaf, 0, stacked("feature"))[order].astype(np.int32),
+            "threshold": _float32_thresholds(stacked("threshold"))[order],
+            "missing_right": stacked("missing_go_to_left")[order] == 0,
+            "children": children,
+        }
+
+        # Same normalisation as DecisionTreeClassifier.predict_proba
+        counts = np.concatenate([tree.value[:, 0, :] for tree in trees])[order]
+        normalizer = counts.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        values = (counts / normalizer).astype(np.float32)
+
+        max_depth = max(tree.max_depth for tree in trees)
+        roots = new_index[offsets].astype(np.int32)
+        return cls(nodes, values, roots, np.asarray(model.classes_), max_depth)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        proba = np.empty((len(X), len(self.classes)), dtype=np.float64)
+        for start in range(0, len(X), BLOCK_ROWS):
+            block = slice(start, start + BLOCK_ROWS)
+            proba[block] = self._vote_sums(self._leaves(X[block]), len(X[block]))
+        return proba / len(self.roots)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Class with the highest summed leaf probability: the argmax of ``predict_proba``
+        without dividing by the number of trees or keeping the probability matrix."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        predicted = np.empty(len(X), dtype=np.intp)
+        for start in range(0, len(X), BLOCK_ROWS):
+            block = slice(start, start + BLOCK_ROWS)
+            predicted[block] = np.argmax(self._vote_sums(self._leaves(X[block]), len(X[block])), axis=1)
+        return self.classes[predicted]
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """Walk every (sample, tree) pair one level per step, across all trees at once.
+
+        Returns the leaf reached by each pair (row-major: sample, tree). Leaves are
+        fixed points, so exactly ``max_depth`` steps are taken with no per-step
+        bookkeeping of which pairs are finished.
+        """
+        n_trees = len(self.roots)
+        n_pairs = len(X) * n_trees
+        node = np.tile(self.roots, len(X))
+        # Offset of each pair's sample row in the flattened X
+        row_offset = np.repeat(np.arange(len(X), dtype=np.int32) * np.int32(X.shape[1]), n_trees)
+        X_flat = X.ravel()
+        children = self.children.ravel()
+        has_missing = np.isnan(X_flat).any()
+        # Per-step buffers, allocated once per block and written in place by every step
+        index = np.empty(n_pairs, dtype=np.int32)
+        x = np.empty(n_pairs, dtype=np.float32)
+        threshold = np.empty(n_pairs, dtype=np.float32)
+        go_right = np.empty(n_pairs, dtype=bool)
+        for _ in range(self.max_depth):
+            np.take(self.feature, node, out=index)
+            np.add(index, row_offset, out=index)
+            np.take(X_flat, index, out=x)
+            np.take(self.threshold, node, out=threshold)
+            # 0 = left, 1 = right; NaN compares False and takes the node's missing-value side
+            np.greater(x, threshold, out=go_right)
+            if has_missing:
+                missing = np.flatnonzero(np.isnan(x))
+                go_right[missing] = self.missing_right[node[missing]]
+            np.add(node, node, out=index)
+            np.add(index, go_right, out=index)
+            np.take(children, index, out=node)
+        return node
+
+    def _vote_sums(self, leaves: np.ndarray, n_samples: int) -> np.ndarray:
+        """Per-sample sum over trees of the leaf class distributions (soft voting, as sklearn)."""
+        votes = self.values[leaves].reshape(n_samples, len(self.roots), -1)
+        return votes.sum(axis=1, dtype=np.float64)
+
+    def save(self, path: Path, source_mtime_ns: int) -> None:
+        """Write to a temporary file next to ``path`` and rename it into place, so concurrent
+        readers see either the previous export or the complete new one."""
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                np.savez(
+                    handle,
+                    **self.nodes,
+                    values=self.values,
+                    roots=self.roots,
+                    classes=self.classes,
+                    max_depth=np.int64(self.max_depth),
+                    source_mtime_ns=np.int64(source_mtime_ns),
+                )
+            os.replace(tmp_name, path)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+
+    @classmethod
+    def load(cls, path: Path, source_mtime_ns: int) -> "CompactForest | None":
+        """Load an export of the model whose mtime is ``source_mtime_ns``; None if stale."""
+        with np.load(path) as data:
+            if int(data["source_mtime_ns"]) != source_mtime_ns:
+                return None
+            nodes = {field: data[field] for field in NODE_FIELDS}
+            return cls(nodes, data["values"], data["roots"], data["classes"], int(data["max_depth"]))
+
+
+def load_or_export(model: Any, model_path: Path, mtime_ns: int) -> Any:
+    """Return the compact forest for ``model`` (exporting it on first use), or ``model`` itself
+    when it is not a RandomForest-style ensemble of decision trees."""
+    if not hasattr(model, "estimators_") or not all(hasattr(e, "tree_") for e in model.estimators_):
+        return model
+
+    export_path = model_path.with_suffix(".forest.npz")
+    try:
+        forest = CompactForest.load(export_path, mtime_ns)
+        if forest is not None:
+            return forest
+    except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+        pass  # missing, stale or damaged export: rebuilt below
+
+    forest = CompactForest.from_sklearn(model)
+    try:
+        forest.save(export_path, mtime_ns)
+    except OSError:  # read-only deployment: keep the in-memory export
+        pass
+    return forest
@@ -1,6 +1,7 @@
 import express from 'express'
 import multer from 'multer'
 import { spawn } from 'node:child_process'
+import net from 'node:net'
 import { fileURLToPath } from 'node:url'
 import path from 'node:path'
 import fs from 'node:fs/promises'
@@ -9,6 +10,8 @@ import os from 'node:os'
 const __filename = fileURLToPath(import.meta.url)
 const __dirname = path.dirname(__filename)
 const PYTHON_SCRIPT = path.join(__dirname, 'predict.py')
+// Unix socket of a running predict_daemon.py; when unset, predict.py is spawned per request
+const PREDICT_SOCKET = process.env.PREDICT_SOCKET
 
 const app = express()
 const PORT = Number(process.env.PORT) || 8000
@@ -42,7 +45,54 @@ function log(message, extra = {}) {
   console.log(JSON.stringify({ ...base, ...extra }))
 }
 
-function runPython(args) {
+function runDaemon(args) {
+  return new Promise((resolve, reject) => {
+    const socket = net.createConnection(PREDICT_SOCKET)
+    let response = ''
+
+    socket.on('connect', () => {
+      socket.write(JSON.stringify(args) + '\n')
+    })
+
+    socket.on('data', (chunk) => {
+      response += chunk.toString()
+    })
+
+    socket.on('end', () => {
+      try {
+        const { code, stdout } = JSON.parse(response)
+        if (code === 0) {
+          resolve(stdout)
+        } else {
+          reject(new Error(stdout || `Python exited with code ${code}`))
+        }
+      } catch (err) {
+        reject(new Error(`Invalid response from predict daemon: ${err.message}`))
+      }
+    })
+
+    socket.on('error', (err) => {
+      reject(err)
+    })
+  })
+}
+
+async function runPython(args) {
+  if (PREDICT_SOCKET) {
+    try {
+      return await runDaemon(args)
+    } catch (error) {
+      // Daemon not running: fall back to a one-off process
+      if (error.code !== 'ENOENT' && error.code !== 'ECONNREFUSED') {
+        throw error
+      }
+      log('predict daemon unavailable, spawning predict.py', { error: error.message })
+    }
+  }
+  return spawnPython(args)
+}
+
+function spawnPython(args) {
   return new Promise((resolve, reject) => {
     const proc = spawn('python3', [PYTHON_SCRIPT, ...args])
 
@@ -140,7 +190,7 @@ app.post('/api/bulk-upload', upload.single('file'), async (req, res) => {
  * - Applies log10 transformations
  * - Removes outliers
  *
- * Flow: Raw CSV → preprocess.py → Processed CSV → predict.py → Response
+ * Flow: Raw CSV → predict.py --preprocess (preprocess.py in-process) → Response
  *
  * Returns predictions + processed feature values + preprocessing statistics.
  */
@@ -152,47 +202,18 @@ app.post('/api/preprocess-and-predict', upload.single('file'), async (req, res)
   const { path: tempPath, originalname, size } = req.file
   log('preprocess-and-predict start', { originalname, size })
 
-  const processedCsvPath = path.join(os.tmpdir(), `processed_${Date.now()}.csv`)
-
   try {
-    // Step 1: Preprocess raw CSV (normalization, validation, transforms)
-    const preprocessScript = path.join(__dirname, 'preprocess.py')
-    const preprocessArgs = [
-      preprocessScript,
-      '--input', tempPath,
-      '--output', processedCsvPath
-    ]
-
-    // Run preprocess.py directly (not through PYTHON_SCRIPT wrapper)
-    const preprocessOutput = await new Promise((resolve, reject) => {
-      const proc = spawn('python3', preprocessArgs)
-
-      let stdout = ''
-      let stderr = ''
-
-      proc.stdout.on('data', (chunk) => {
-        stdout += chunk.toString()
-      })
-
-      proc.stderr.on('data', (chunk) => {
-        stderr += chunk.toString()
-      })
-
-      proc.on('close', (code) => {
-        if (code === 0) {
-          resolve(stdout)
-        } else {
-          const errorOutput = stdout || stderr || `Preprocessing exited with code ${code}`
-          reject(new Error(errorOutput))
-        }
-      })
+    // Preprocess (normalization, validation, transforms) and predict in one
+    // predict.py run: the processed features stay in memory, no file in between
+    const pythonOutput = await runPython(['--mode', 'bulk', '--csv', tempPath, '--preprocess'])
+    const predictionResult = JSON.parse(pythonOutput)
 
-      proc.on('error', (err) => {
-        reject(err)
-      })
-    })
+    if (predictionResult.error) {
+      log('preprocess-and-predict prediction error', { error: predictionResult.error })
+      return res.status(400).json({ error: predictionResult.error })
+    }
 
-    const preprocessResult = JSON.parse(preprocessOutput)
+    const preprocessResult = predictionResult.preprocessing
 
     if (!preprocessResult.success) {
       log('preprocess-and-predict preprocessing failed', {
@@ -211,16 +232,7 @@ app.post('/api/preprocess-and-predict', upload.single('file'), async (req, res)
       removed_rows: preprocessResult.removed_rows
     })
 
-    // Step 2: Run predictions on processed CSV
-    const pythonOutput = await runPython(['--mode', 'bulk', '--csv', processedCsvPath])
-    const predictionResult = JSON.parse(pythonOutput)
-
-    if (predictionResult.error) {
-      log('preprocess-and-predict prediction error', { error: predictionResult.error })
-      return res.status(400).json({ error: predictionResult.error })
-    }
-
-    // Step 3: Combine preprocessing stats with predictions
+    // Combine preprocessing stats with predictions
     const combinedResult = {
       entries: predictionResult.entries,
       errors: predictionResult.errors,
@@ -244,14 +256,11 @@ app.post('/api/preprocess-and-predict', upload.single('file'), async (req, res)
     log('preprocess-and-predict failure', { error: error.message })
     return res.status(500).json({ error: 'Failed to process the CSV file.' })
   } finally {
-    // Clean up both temporary files
-    for (const filePath of [tempPath, processedCsvPath]) {
-      if (filePath) {
-        try {
-          await fs.unlink(filePath)
-        } catch (cleanupError) {
-          log('preprocess-and-predict cleanup error', { error: cleanupError.message, file: filePath })
-        }
+    if (tempPath) {
+      try {
+        await fs.unlink(tempPath)
+      } catch (cleanupError) {
+        log('preprocess-and-predict cleanup error', { error: cleanupError.message })
       }
     }
   }
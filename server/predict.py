@@ -3,23 +3,59 @@ from __future__ import annotations
 
 import argparse
 import csv
+import functools
 import json
 import sys
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import joblib
+import numpy as np
+import pandas as pd
+
+import preprocess
+from forest import load_or_export
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:  # optional: bulk CSVs are parsed with pandas instead
+    pa = pc = pacsv = None
 
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
 MODEL_PATH = ROOT_DIR / "model.joblib"
 
+# Up to this many rows the compact forest (forest.py) beats sklearn's per-call
+# overhead; larger batches go through the sklearn estimator.
+SMALL_BATCH_ROWS = 256
+
 
 def load_model() -> Tuple[Any, List[str], Dict[int, str]]:
+    return _bundle()[:3]
+
+
+def load_predictor() -> Any:
+    """Compact float32 export of the forest, or the sklearn model if it is not a forest."""
+    return _bundle()[3]
+
+
+def _bundle() -> Tuple[Any, List[str], Dict[int, str], Any]:
     try:
-        bundle = joblib.load(MODEL_PATH)
-    except Exception as exc:  # pragma: no cover - defensive logging
+        mtime_ns = MODEL_PATH.stat().st_mtime_ns
+    except OSError as exc:
         raise RuntimeError(f"Failed to load model from {MODEL_PATH}: {exc}") from exc
+    return _load_bundle(MODEL_PATH, mtime_ns)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_bundle(model_path: Path, mtime_ns: int) -> Tuple[Any, List[str], Dict[int, str], Any]:
+    """Unpickle the bundle once per (path, mtime); a retrained model.joblib is picked up."""
+    try:
+        bundle = joblib.load(model_path)
+    except Exception as exc:  # pragma: no cover - defensive logging
+        raise RuntimeError(f"Failed to load model from {model_path}: {exc}") from exc
 
     model = bundle.get("model")
     feature_names = bundle.get("feature_names")
@@ -29,7 +65,8 @@ def load_model() -> Tuple[Any, List[str], Dict[int, str]]:
         raise RuntimeError("Model bundle missing required keys: model, feature_names, class_labels")
 
     index_to_label = {index: label for label, index in class_labels.items()}
-    return model, feature_names, index_to_label
+    predictor = load_or_export(model, model_path, mtime_ns)
+    return model, feature_names, index_to_label, predictor
 
 
 def ensure_features(data: Dict[str, Any], feature_names: List[str]) -> List[float]:
@@ -53,11 +90,25 @@ def ensure_features(data: Dict[str, Any], feature_names: List[str]) -> List[floa
     return values
 
 
+def input_dtype(predictor: Any) -> Any:
+    """dtype the predictor compares in: float32 for forests, float64 otherwise (e.g. HistGBM)."""
+    return np.float32 if hasattr(predictor, "estimators_") or hasattr(predictor, "roots") else np.float64
+
+
 def predict_single(payload: Dict[str, Any]) -> Dict[str, Any]:
     model, feature_names, index_to_label = load_model()
     features = ensure_features(payload, feature_names)
 
-    predicted_index = int(model.predict([features])[0])
+    # One row: the compact forest avoids sklearn's per-call validation and thread pool.
+    # As in predict_bulk, a row with NaN or values beyond float32 range goes to the
+    # estimator, which decides whether it accepts them.
+    X = np.asarray(features, dtype=np.float64).reshape(1, -1)
+    if (np.abs(X) <= np.finfo(np.float32).max).all():
+        predictor = load_predictor()
+        X = X.astype(input_dtype(predictor), copy=False)
+    else:
+        predictor = model
+    predicted_index = int(predictor.predict(X)[0])
     label = index_to_label.get(predicted_index)
     if label is None:
         raise RuntimeError(f"Predicted class index {predicted_index} not found in label map.")
@@ -73,56 +124,247 @@ def normalise_headers(fieldnames: List[str]) -> Dict[str, str]:
     return mapping
 
 
-def predict_bulk(csv_path: Path) -> Dict[str, Any]:
-    model, feature_names, index_to_label = load_model()
+def _read_columns_arrow(csv_path: Path, n_fields: int, columns: List[int]) -> List[Any]:
+    """Feature columns as Arrow string arrays ("" becomes null), parsed by the multi-threaded
+    pyarrow reader. Raises ``pa.ArrowInvalid`` on ragged rows, which the pandas path tolerates."""
+    names = [f"f{i}" for i in range(n_fields)]
+    table = pacsv.read_csv(
+        csv_path,
+        read_options=pacsv.ReadOptions(skip_rows=1, column_names=names),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=[names[i] for i in columns],
+            column_types={names[i]: pa.string() for i in columns},
+            null_values=[""],
+            strings_can_be_null=True,
+        ),
+    )
+    return [table.column(names[i]) for i in columns]
+
+
+def _read_columns_pandas(csv_path: Path, columns: List[int]) -> List[Any]:
+    try:
+        raw = pd.read_csv(
+            csv_path,
+            header=None,
+            skiprows=1,
+            usecols=columns,
+            dtype=str,
+            keep_default_na=False,
+            index_col=False,
+            encoding="utf-8",
+        )
+    except pd.errors.EmptyDataError:  # header only
+        raw = pd.DataFrame(columns=columns, dtype=object)
+    return [raw[col] for col in columns]
+
+
+def _column_to_float(values: Any) -> np.ndarray:
+    """Exact float() parse of a string column; cells that do not parse become NaN."""
+    if pa is not None and isinstance(values, pa.ChunkedArray):
+        try:
+            return pc.cast(values, pa.float64()).to_numpy()
+        except pa.ArrowInvalid:  # stricter than float(), e.g. surrounding spaces
+            values = pd.Series(values.to_numpy(zero_copy_only=False), dtype=object)
+    try:
+        return values.astype(np.float64).to_numpy()
+    except (TypeError, ValueError):
+        parsed = np.empty(len(values), dtype=np.float64)
+        for i, raw_value in enumerate(values):
+            try:
+                parsed[i] = float(raw_value)
+            except (TypeError, ValueError):
+                parsed[i] = np.nan
+        return parsed
+
+
+def _column_is_empty(values: Any) -> np.ndarray:
+    """Mask of cells ``ensure_features`` reports as missing: empty or absent."""
+    if pa is not None and isinstance(values, pa.ChunkedArray):
+        return values.is_null().to_numpy(zero_copy_only=False)
+    return (values.isna() | (values == "")).to_numpy()
 
+
+def _parses_as_float(text: Any) -> bool:
+    try:
+        float(text)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _cell(values: Any, idx: int) -> Any:
+    """Raw cell as read from the CSV: its string, or None when empty/absent."""
+    value = values[idx]
+    if pa is not None and isinstance(value, pa.Scalar):
+        value = value.as_py()
+    return value if isinstance(value, str) else None
+
+
+def _feature_positions(fieldnames: List[str], feature_names: List[str]) -> List[int]:
+    """Column index of each feature, matched case-insensitively; with duplicate headers the
+    last column wins, as with csv.DictReader."""
+    header_map = normalise_headers(fieldnames)
+    missing_columns = [name for name in feature_names if name.lower() not in header_map]
+    if missing_columns:
+        raise ValueError(
+            "CSV file is missing required columns: " + ", ".join(missing_columns)
+        )
+    position = {name: i for i, name in enumerate(fieldnames)}
+    return [position[header_map[name.lower()]] for name in feature_names]
+
+
+def _read_csv_features(csv_path: Path, feature_names: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Any]]:
+    """Feature matrix of a CSV plus its masks of empty and non-numeric cells and the raw columns."""
     with csv_path.open(newline="", encoding="utf-8") as handle:
-        reader = csv.DictReader(handle)
-        if reader.fieldnames is None:
-            raise ValueError("CSV file is missing a header row.")
-
-        header_map = normalise_headers(reader.fieldnames)
-        missing_columns = [name for name in feature_names if name.lower() not in header_map]
-        if missing_columns:
-            raise ValueError(
-                "CSV file is missing required columns: " + ", ".join(missing_columns)
-            )
-
-        entries: List[Dict[str, Any]] = []
-        errors: List[Dict[str, Any]] = []
-
-        for idx, row in enumerate(reader):
-            row_payload = {name: row.get(header_map[name.lower()], "") for name in feature_names}
-            try:
-                features = ensure_features(row_payload, feature_names)
-                predicted_index = int(model.predict([features])[0])
-                label = index_to_label.get(predicted_index, "UNKNOWN")
+        fieldnames = next(csv.reader(handle), None)
+    if fieldnames is None:
+        raise ValueError("CSV file is missing a header row.")
+
+    # Parse only the feature columns, as strings, in one pass
+    columns = _feature_positions(fieldnames, feature_names)
+    raw = None
+    if pacsv is not None:
+        try:
+            raw = _read_columns_arrow(csv_path, len(fieldnames), columns)
+        except pa.ArrowInvalid:
+            raw = None
+    if raw is None:
+        raw = _read_columns_pandas(csv_path, columns)
+
+    # Each parsed column is written straight into one preallocated matrix
+    X = np.empty((len(raw[0]), len(feature_names)), dtype=np.float64)
+    for j, values in enumerate(raw):
+        X[:, j] = _column_to_float(values)
+
+    # Only NaN cells are re-checked with float(): a literal "nan" is numeric
+    empty = np.column_stack([_column_is_empty(values) for values in raw]) if len(X) else \
+        np.zeros(X.shape, dtype=bool)
+    unparsed = np.isnan(X) & ~empty
+    for idx, j in zip(*np.nonzero(unparsed)):
+        unparsed[idx, j] = not _parses_as_float(_cell(raw[j], idx))
+    return X, empty, unparsed, raw
+
+
+def _frame_features(frame: pd.DataFrame, feature_names: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Any]]:
+    """Feature matrix of preprocess.py output plus the same masks as ``_read_csv_features``.
+    NaN in a numeric column is reported as missing, like the empty cell ``to_csv`` writes for
+    it. Text columns (a pre-processed upload is passed through as read) are parsed and
+    checked cell by cell as in a CSV."""
+    columns = _feature_positions([str(name) for name in frame.columns], feature_names)
+    X = np.empty((len(frame), len(feature_names)), dtype=np.float64)
+    empty = np.empty(X.shape, dtype=bool)
+    raw: List[Any] = []
+    for j, column in enumerate(columns):
+        values = frame.iloc[:, column]
+        if pd.api.types.is_numeric_dtype(values):
+            X[:, j] = values.to_numpy(dtype=np.float64)
+            empty[:, j] = np.isnan(X[:, j])
+            raw.append(None)
+        else:
+            values = pd.Series(values.to_numpy(dtype=object))
+            X[:, j] = _column_to_float(values)
+            empty[:, j] = _column_is_empty(values)
+            raw.append(values)
+
+    unparsed = np.isnan(X) & ~empty
+    for idx, j in zip(*np.nonzero(unparsed)):
+        unparsed[idx, j] = not _parses_as_float(_cell(raw[j], idx))
+    return X, empty, unparsed, raw
+
+
+def _read_parquet_features(parquet_path: Path, feature_names: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Any]]:
+    """Feature matrix of a Parquet file (as written by preprocess.py)."""
+    return _frame_features(pd.read_parquet(parquet_path), feature_names)
+
+
+def predict_bulk(csv_path: Path) -> Dict[str, Any]:
+    _, feature_names, _ = load_model()
+    read_features = _read_parquet_features if csv_path.suffix.lower() == ".parquet" else _read_csv_features
+    return _predict_features(*read_features(csv_path, feature_names))
 
-                # Build entry with label AND processed feature values
-                entry = {"row": idx, "label": label}
 
-                # Add all feature values that the model actually saw
-                for i, feat_name in enumerate(feature_names):
-                    entry[feat_name] = features[i]
+def predict_raw_bulk(csv_path: Path) -> Dict[str, Any]:
+    """Preprocess a raw Kepler CSV in this process and predict on the resulting frame, with no
+    processed file written and parsed back. The preprocess.py result is returned under
+    "preprocessing"; when it failed there are no entries."""
+    frame, preprocessing = preprocess.preprocess_frame(csv_path, preprocess.load_training_stats())
+    if frame is None:
+        return {"entries": [], "errors": [], "preprocessing": preprocessing}
 
-                entries.append(entry)
-            except Exception as exc:  # capture row-specific issues
-                errors.append({"row": idx, "message": str(exc)})
+    _, feature_names, _ = load_model()
+    result = _predict_features(*_frame_features(frame, feature_names))
+    result["preprocessing"] = preprocessing
+    return result
 
-        return {"entries": entries, "errors": errors}
+
+def _predict_features(X: np.ndarray, empty: np.ndarray, unparsed: np.ndarray, raw: List[Any]) -> Dict[str, Any]:
+    model, feature_names, index_to_label = load_model()
+
+    # Cell-level masks, from which row errors are reported exactly as
+    # ensure_features words them: a non-numeric cell first, otherwise missing ones.
+    valid = ~(empty | unparsed).any(axis=1)
+    # Valid rows with NaN or values beyond float32 range skip the fast path; the
+    # estimator decides whether it accepts them.
+    batch = valid & (np.abs(X) <= np.finfo(np.float32).max).all(axis=1)
+    rest = valid & ~batch
+
+    entries: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+
+    def add_entries(rows: np.ndarray, predicted: np.ndarray, X_rows: np.ndarray) -> None:
+        for idx, predicted_index, features in zip(rows.tolist(), predicted.tolist(), X_rows.tolist()):
+            entry = {"row": idx, "label": index_to_label.get(int(predicted_index), "UNKNOWN")}
+            # Add all feature values that the model actually saw
+            entry.update(zip(feature_names, features))
+            entries.append(entry)
+
+    if batch.any():
+        rows = np.flatnonzero(batch)
+        predictor = load_predictor() if rows.size <= SMALL_BATCH_ROWS else model
+        X_batch = X if rows.size == len(X) else X[batch]
+        # One C-contiguous copy in the dtype the predictor compares in
+        add_entries(rows, predictor.predict(np.ascontiguousarray(X_batch, dtype=input_dtype(predictor))), X_batch)
+
+    if rest.any():
+        rows = np.flatnonzero(rest)
+        try:
+            add_entries(rows, model.predict(X[rest]), X[rest])
+        except Exception:
+            # Some row is rejected: predict one by one to attribute each error
+            for idx in rows.tolist():
+                try:
+                    add_entries(np.array([idx]), model.predict(X[idx:idx + 1]), X[idx:idx + 1])
+                except Exception as exc:  # capture row-specific issues
+                    errors.append({"row": idx, "message": str(exc)})
+
+    for idx in np.flatnonzero(~valid).tolist():
+        bad = np.flatnonzero(unparsed[idx])
+        if bad.size:
+            name = feature_names[bad[0]]
+            message = f"Feature '{name}' expects a numeric value, received '{_cell(raw[bad[0]], idx)}'."
+        else:
+            message = f"Missing required feature(s): {', '.join(feature_names[j] for j in np.flatnonzero(empty[idx]))}."
+        errors.append({"row": idx, "message": message})
+
+    entries.sort(key=lambda entry: entry["row"])
+    errors.sort(key=lambda error: error["row"])
+    return {"entries": entries, "errors": errors}
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Run predictions using the HuntEX model.")
     parser.add_argument("--mode", choices={"single", "bulk"}, required=True)
     parser.add_argument("--data", help="JSON payload for single mode.")
-    parser.add_argument("--csv", type=Path, help="CSV file path for bulk mode.")
-    return parser.parse_args()
+    parser.add_argument("--csv", type=Path, help="CSV (or Parquet) file path for bulk mode.")
+    parser.add_argument(
+        "--preprocess", action="store_true", help="Bulk mode: preprocess the raw CSV (preprocess.py) first."
+    )
+    return parser.parse_args(argv)
 
 
-def main() -> int:
-    args = parse_args()
-
+def run(args: argparse.Namespace) -> Tuple[int, str]:
+    """Exit code and JSON output of one CLI invocation (shared with predict_daemon.py)."""
     try:
         if args.mode == "single":
             if not args.data:
@@ -134,13 +376,17 @@ def main() -> int:
                 raise ValueError("Bulk mode requires the --csv argument.")
             if not args.csv.exists():
                 raise FileNotFoundError(f"CSV file not found: {args.csv}")
-            result = predict_bulk(args.csv)
+            result = predict_raw_bulk(args.csv) if args.preprocess else predict_bulk(args.csv)
     except Exception as exc:
-        sys.stdout.write(json.dumps({"error": str(exc)}))
-        return 1
+        return 1, json.dumps({"error": str(exc)})
+
+    return 0, json.dumps(result)
 
-    sys.stdout.write(json.dumps(result))
-    return 0
+
+def main() -> int:
+    code, output = run(parse_args())
+    sys.stdout.write(output)
+    return code
 
 
 if __name__ == "__main__":
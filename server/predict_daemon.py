@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Preloaded prediction server on a Unix socket.
+
+``predict.py`` pays for interpreter start-up, the numpy/sklearn imports and the
+model load on every request. This daemon does that once: the parent loads the
+bundle, then forks one child per connection. Children inherit the imported
+modules and the already loaded model from the parent, so a request only costs
+the prediction itself.
+
+Protocol: the client sends the ``predict.py`` arguments as one JSON array
+terminated by a newline, e.g. ``["--mode", "single", "--data", "{...}"]``, and
+receives ``{"code": <exit code>, "stdout": <what predict.py would print>}``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socketserver
+from pathlib import Path
+from typing import Optional
+
+import predict
+
+
+DEFAULT_SOCKET = os.environ.get("PREDICT_SOCKET", "/tmp/huntex-predict.sock")
+
+
+class PredictHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        try:
+            argv = json.loads(self.rfile.readline())
+            code, output = predict.run(predict.parse_args([str(arg) for arg in argv]))
+        except SystemExit as exc:  # argparse rejected the arguments (usage went to stderr)
+            code, output = exc.code if isinstance(exc.code, int) else 2, ""
+        except ValueError as exc:  # malformed request line
+            code, output = 1, json.dumps({"error": f"Invalid request: {exc}"})
+        self.wfile.write(json.dumps({"code": code, "stdout": output}).encode("utf-8") + b"\n")
+
+
+class PredictServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    def process_request(self, request, client_address) -> None:
+        # Refresh in the parent before forking: a retrained model.joblib is loaded
+        # once here instead of in every child (a no-op stat while unchanged).
+        try:
+            predict.load_model()
+            predict.load_predictor()
+        except RuntimeError:
+            pass  # the child reports the load error to the client
+        super().process_request(request, client_address)
+
+
+def serve(socket_path: Path) -> None:
+    predict.load_model()
+    predict.load_predictor()
+
+    if socket_path.exists():
+        socket_path.unlink()
+    with PredictServer(str(socket_path), PredictHandler) as server:
+        print(json.dumps({"message": "predict daemon ready", "socket": str(socket_path)}), flush=True)
+        try:
+            server.serve_forever()
+        finally:
+            socket_path.unlink(missing_ok=True)
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve HuntEX predictions from a preloaded model.")
+    parser.add_argument("--socket", type=Path, default=Path(DEFAULT_SOCKET), help="Unix socket path.")
+    return parser.parse_args(argv)
+
+
+def main() -> int:
+    serve(parse_args().socket)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -17,35 +17,198 @@ to maintain prediction accuracy.
 from __future__ import annotations
 
 import argparse
+import csv
+import functools
 import json
 import sys
 from pathlib import Path
-from typing import Dict, List, Tuple
+from types import MappingProxyType
+from typing import AbstractSet, Dict, List, Mapping, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:  # opcional: lectura multihilo del CSV y salida .parquet
+    pa = pc = pacsv = pq = None
+
 
 # Paths
 SCRIPT_DIR = Path(__file__).resolve().parent
 STATS_PATH = SCRIPT_DIR / "training_stats.json"
 
+# Rows parsed at a time when reading an upload (see read_pipeline_columns)
+CSV_CHUNK_ROWS = 50_000
+
+# Cells pd.read_csv reads as NaN by default (the '#' ones are comments for it)
+CSV_NA_VALUES = ['', '-NaN', '-nan', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+# Features the model expects, in this order (required ones first)
+REQUIRED_FEATURES = ('koi_period', 'koi_depth', 'koi_duration', 'koi_prad')
+OPTIONAL_FEATURES = (
+    'koi_teq', 'koi_insol', 'koi_steff', 'koi_slogg',
+    'koi_srad', 'koi_model_snr', 'koi_impact'
+)
+FINAL_SCHEMA = REQUIRED_FEATURES + OPTIONAL_FEATURES
+
+# Leading rows is_already_preprocessed checks first: raw data usually shows there
+DETECTION_SAMPLE_ROWS = 10_000
+
+# Per-row errors listed for each failed check; beyond that only the count is reported
+MAX_ERRORS_PER_CHECK = 100
+
+
+# Features that undergo log transformation, with the (min, max) range their values
+# stay within once in log10 scale (see is_already_preprocessed)
+LOG_SCALE_BOUNDS = {
+    # Log range: -0.7 to 2.86 | Raw range: 0.2 to 730
+    # Upper bound: log10(730) = 2.86, so max_val > 3.5 → definitely raw
+    'koi_period': (-1.5, 3.5),
+    # Log range: 1.0 to 5.0 | Raw range: 10 to 100,000
+    # Upper bound: log10(100000) = 5, so max_val > 6 → definitely raw
+    'koi_depth': (0.0, 6.0),
+    # Log range: -0.3 to 1.5 | Raw range: 0.5 to 30
+    # Upper bound: log10(30) = 1.48, so max_val > 2.5 → definitely raw
+    'koi_prad': (-1.0, 2.5),
+    # Log range: -1.5 to 3.0 | Raw range: 0.03 to 1000
+    # Upper bound: log10(1000) = 3, so max_val > 4 → definitely raw
+    'koi_insol': (-2.0, 4.0),
+    # Log range: -0.5 to 0.5 | Raw range: 0.3 to 3
+    # Upper bound: log10(3) = 0.48, so max_val > 1.5 → definitely raw
+    'koi_srad': (-1.0, 1.5),
+    # Log range: -1.0 to 4.0 | Raw range: 0.1 to 10000
+    # Upper bound: log10(10000) = 4, so max_val > 5 → definitely raw
+    'koi_model_snr': (-2.0, 5.0),
+}
+
 
 class PreprocessingError(Exception):
     """Error durante el preprocesamiento."""
     pass
 
 
-def load_training_stats() -> Dict:
-    """Carga estadísticas del dataset de entrenamiento."""
+def load_training_stats() -> Mapping:
+    """Carga estadísticas del dataset de entrenamiento.
+
+    El JSON se parsea una sola vez por proceso (mientras el archivo no cambie) y se
+    devuelve como vista de solo lectura, ya que todas las llamadas comparten el resultado.
+    """
     if not STATS_PATH.exists():
         raise FileNotFoundError(
             f"Training stats not found: {STATS_PATH}\n"
             "Run Improved-RF/extract_training_stats.py first."
         )
 
-    with open(STATS_PATH, 'r') as f:
-        return json.load(f)
+    return _load_stats(STATS_PATH, STATS_PATH.stat().st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_stats(stats_path: Path, mtime_ns: int) -> Mapping:
+    with open(stats_path, 'r') as f:
+        return _freeze(json.load(f))
+
+
+def _freeze(value):
+    """Dicts → MappingProxyType y listas → tuplas, recursivamente."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def read_pipeline_columns(csv_path: Path, columns: List[str]) -> pd.DataFrame:
+    """
+    Read the CSV keeping only `columns` (matched after normalize_column_names).
+
+    Kepler exports carry well over a hundred columns, most of them unused here, and
+    unused columns are skipped by the parser itself. pyarrow's multi-threaded reader
+    is tried first (see _read_pipeline_columns_arrow); files it cannot read as
+    float64 features are read by pandas in chunks of CSV_CHUNK_ROWS rows, which
+    bounds peak memory by the chunk size plus the pruned frame. The row index runs
+    continuously either way, so error row numbers match.
+    """
+    if pacsv is not None:
+        df = _read_pipeline_columns_arrow(csv_path, columns)
+        if df is not None:
+            return df
+
+    wanted = set(columns)
+    chunks = []
+    # round_trip: correctly rounded float parsing, the values float() gives in
+    # predict.py (the default converter can be 1 ulp off on 17-digit values)
+    with pd.read_csv(csv_path, comment='#', chunksize=CSV_CHUNK_ROWS, float_precision='round_trip',
+                     usecols=lambda name: name.strip().lower() in wanted) as reader:
+        for chunk in reader:
+            chunk = normalize_column_names(chunk)
+            chunks.append(chunk[[col for col in chunk.columns if col in columns]])
+    df = pd.concat(chunks)
+    if len(df.columns) == 0:
+        # Ninguna columna del pipeline: el parser no devolvió filas, así que se
+        # cuentan leyendo solo la primera columna (para el mensaje de error correcto)
+        df = pd.read_csv(csv_path, comment='#', usecols=[0])[[]]
+    return df
+
+
+def _scan_header(csv_path: Path) -> Tuple[int, List[str]]:
+    """Cuenta las líneas de comentario ('#') iniciales y devuelve (n_comentarios, cabecera)."""
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        for n_comments, line in enumerate(f):
+            if not line.startswith('#'):
+                return n_comments, next(csv.reader([line]), [])
+    return 0, []
+
+
+def _read_pipeline_columns_arrow(csv_path: Path, columns: List[str]) -> Optional[pd.DataFrame]:
+    """
+    read_pipeline_columns with pyarrow.csv, or None to let pandas read the file.
+
+    Leading '#' lines are skipped before the header (Arrow has no comment support).
+    Features are read as float64 and kepoi_name as text, with pandas' NA tokens. A
+    file Arrow cannot read that way (non-numeric cells, ragged rows, comments further
+    down) goes to pandas, as does one without pipeline columns or with two headers
+    that normalize to the same name. So do values pandas would keep as text but
+    Arrow parses as floats: NaN that is not an NA token ('nan '), overflow to
+    infinity ('1e400') and integers beyond int64.
+    """
+    try:
+        n_comments, header = _scan_header(csv_path)
+    except (OSError, UnicodeDecodeError):
+        return None
+
+    include = [name for name in header if name.strip().lower() in columns]
+    normalized = [name.strip().lower() for name in include]
+    if not include or len(set(normalized)) != len(normalized) or len(set(header)) != len(header):
+        return None
+
+    column_types = {
+        name: pa.string() if norm == 'kepoi_name' else pa.float64()
+        for name, norm in zip(include, normalized)
+    }
+    try:
+        table = pacsv.read_csv(
+            csv_path,
+            read_options=pacsv.ReadOptions(skip_rows=n_comments),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=include, column_types=column_types,
+                null_values=CSV_NA_VALUES, strings_can_be_null=True
+            ),
+        )
+    except (pa.ArrowInvalid, pa.ArrowTypeError, KeyError):
+        return None
+
+    for name, norm in zip(include, normalized):
+        if norm == 'kepoi_name':
+            continue
+        values = table.column(name)
+        if (pc.any(pc.invert(pc.is_finite(values))).as_py()
+                or pc.any(pc.greater_equal(pc.abs(values), 2.0 ** 63)).as_py()):
+            return None
+    return normalize_column_names(table.to_pandas())
 
 
 def normalize_column_names(df: pd.DataFrame) -> pd.DataFrame:
@@ -71,60 +234,45 @@ def is_already_preprocessed(df: pd.DataFrame) -> bool:
 
     Returns: True if already preprocessed, False if raw data
     """
-    # Features that undergo log transformation
-    log_features = ['koi_period', 'koi_depth', 'koi_prad', 'koi_insol', 'koi_srad', 'koi_model_snr']
-
-    # Check if log features exist
-    available_log_features = [f for f in log_features if f in df.columns]
+    # Only features whose every value lies within these bounds count as log scale.
+    # Strategy: strict upper bounds - if ANY value exceeds one, the data is raw
+    available_log_features = [f for f in LOG_SCALE_BOUNDS if f in df.columns]
     if len(available_log_features) == 0:
         return False  # Can't determine, assume raw
 
+    # Raw data usually shows in the first rows already. Features out of log range
+    # there can only fail on the full data too; once they outnumber all the others,
+    # under 50% can pass whatever the remaining rows hold, and the full scan is
+    # skipped (numeric columns only, so the outcome is exactly the full scan's)
+    block = df[available_log_features]
+    if len(df) > DETECTION_SAMPLE_ROWS and all(pd.api.types.is_numeric_dtype(t) for t in block.dtypes):
+        head = block.iloc[:DETECTION_SAMPLE_ROWS].agg(['min', 'max'])
+        failing = sum(
+            1 for feat in available_log_features
+            if not pd.isna(head.at['min', feat])
+            and not (LOG_SCALE_BOUNDS[feat][0] <= head.at['min', feat]
+                     and head.at['max', feat] <= LOG_SCALE_BOUNDS[feat][1])
+        )
+        if failing > len(available_log_features) - failing:
+            return False
+
+    # Min and max of every log feature in one reduction (NaN skipped)
+    extremes = block.agg(['min', 'max'])
+
     # Analyze value ranges
     indicators = 0
     total_checks = 0
 
     for feat in available_log_features:
-        values = df[feat].dropna()
-        if len(values) == 0:
-            continue
+        min_val = extremes.at['min', feat]
+        max_val = extremes.at['max', feat]
+        if pd.isna(min_val):
+            continue  # no values
 
-        min_val = values.min()
-        max_val = values.max()
         total_checks += 1
-
-        # Check ranges for each feature
-        # Strategy: Use strict upper bounds to detect log-transformed data
-        # If ANY value exceeds the log-scale upper bound, it's definitely raw
-        if feat == 'koi_period':
-            # Log range: -0.7 to 2.86 | Raw range: 0.2 to 730
-            # Upper bound: log10(730) = 2.86, so max_val > 3.5 → definitely raw
-            if max_val <= 3.5 and min_val >= -1.5:
-                indicators += 1
-        elif feat == 'koi_depth':
-            # Log range: 1.0 to 5.0 | Raw range: 10 to 100,000
-            # Upper bound: log10(100000) = 5, so max_val > 6 → definitely raw
-            if max_val <= 6.0 and min_val >= 0.0:
-                indicators += 1
-        elif feat == 'koi_prad':
-            # Log range: -0.3 to 1.5 | Raw range: 0.5 to 30
-            # Upper bound: log10(30) = 1.48, so max_val > 2.5 → definitely raw
-            if max_val <= 2.5 and min_val >= -1.0:
-                indicators += 1
-        elif feat == 'koi_insol':
-            # Log range: -1.5 to 3.0 | Raw range: 0.03 to 1000
-            # Upper bound: log10(1000) = 3, so max_val > 4 → definitely raw
-            if max_val <= 4.0 and min_val >= -2.0:
-                indicators += 1
-        elif feat == 'koi_srad':
-            # Log range: -0.5 to 0.5 | Raw range: 0.3 to 3
-            # Upper bound: log10(3) = 0.48, so max_val > 1.5 → definitely raw
-            if max_val <= 1.5 and min_val >= -1.0:
-                indicators += 1
-        elif feat == 'koi_model_snr':
-            # Log range: -1.0 to 4.0 | Raw range: 0.1 to 10000
-            # Upper bound: log10(10000) = 4, so max_val > 5 → definitely raw
-            if max_val <= 5.0 and min_val >= -2.0:
-                indicators += 1
+        lower, upper = LOG_SCALE_BOUNDS[feat]
+        if max_val <= upper and min_val >= lower:
+            indicators += 1
 
     # If >= 50% of checks indicate preprocessed data, classify as preprocessed
     if total_checks == 0:
@@ -134,12 +282,28 @@ def is_already_preprocessed(df: pd.DataFrame) -> bool:
     return confidence >= 0.5
 
 
-def validate_required_features(df: pd.DataFrame, required: List[str]) -> Tuple[bool, List[str]]:
+def row_errors(rows, message: str, warnings: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Un error por fila de `rows` (índices del CSV), como máximo MAX_ERRORS_PER_CHECK.
+    Si fallan más filas se listan solo las primeras y el total se añade a `warnings`.
+    """
+    if len(rows) > MAX_ERRORS_PER_CHECK and warnings is not None:
+        warnings.append(
+            f'{len(rows)} rows failed: {message} (first {MAX_ERRORS_PER_CHECK} listed in errors)'
+        )
+    # tolist() converts the (integer) row labels to Python ints in one call
+    return [{'row': idx, 'message': message} for idx in rows[:MAX_ERRORS_PER_CHECK].tolist()]
+
+
+def validate_required_features(df: pd.DataFrame, required: List[str],
+                                columns: Optional[AbstractSet[str]] = None) -> Tuple[bool, List[str]]:
     """
     Verifica que el CSV contenga las features requeridas mínimas.
+    `columns`: conjunto de columnas de df ya calculado por el llamador (opcional).
     Returns: (es_valido, features_faltantes)
     """
-    missing = [feat for feat in required if feat not in df.columns]
+    present = frozenset(df.columns) if columns is None else columns
+    missing = [feat for feat in required if feat not in present]
     return len(missing) == 0, missing
 
 
@@ -150,51 +314,49 @@ def remove_leakage_features(df: pd.DataFrame) -> pd.DataFrame:
     """
     leakage_features = ['koi_score', 'koi_pdisposition']
 
-    for feat in leakage_features:
-        if feat in df.columns:
-            df = df.drop(columns=[feat])
+    # Una sola llamada a drop (y ninguna copia si no hay nada que eliminar)
+    to_drop = [feat for feat in leakage_features if feat in df.columns]
+    if to_drop:
+        df = df.drop(columns=to_drop)
 
     return df
 
 
-def validate_physical_ranges(df: pd.DataFrame, stats: Dict) -> Tuple[pd.DataFrame, List[Dict]]:
+def range_violations(df: pd.DataFrame, stats: Dict,
+                     warnings: Optional[List[str]] = None) -> Tuple[np.ndarray, List[Dict]]:
     """
-    Validate physical plausibility of exoplanet parameters and remove invalid rows.
+    Check physical plausibility of exoplanet parameters, without dropping rows.
 
     Ranges based on known exoplanet physics and Kepler mission constraints.
     Source: Improved-RF/data.py:164-205
 
-    Returns: (cleaned_dataframe, per_row_errors)
+    Returns: (mask_of_invalid_rows, per_row_errors)
     """
     valid_ranges = stats['valid_ranges']
+    rows = df.index.to_numpy()
     errors = []
-    mask = pd.Series([True] * len(df), index=df.index)
+    invalid_any = np.zeros(len(df), dtype=bool)
+
+    def flag(invalid: np.ndarray, message: str) -> None:
+        """Record one error per offending row and fold the rows into the drop mask."""
+        errors.extend(row_errors(rows[invalid], message, warnings))
+        np.logical_or(invalid_any, invalid, out=invalid_any)
 
     # Orbital period: 0.2 - 730 days
     # Lower bound: Roche limit for gas giants (~0.2 days)
     # Upper bound: 2 years (Kepler mission design limit)
     if 'koi_period' in df.columns:
         min_val, max_val = valid_ranges['koi_period']
-        invalid = (df['koi_period'] <= min_val) | (df['koi_period'] > max_val)
-        for idx in df[invalid].index:
-            errors.append({
-                'row': int(idx),
-                'message': f'koi_period out of range [{min_val}, {max_val}]'
-            })
-        mask &= ~invalid
+        values = df['koi_period'].to_numpy()
+        flag((values <= min_val) | (values > max_val), f'koi_period out of range [{min_val}, {max_val}]')
 
     # Planet radius: 0.5 - 30 R_earth
     # Lower bound: Smaller than Mercury (detection limit)
     # Upper bound: Larger than Jupiter is rare but possible (brown dwarf boundary)
     if 'koi_prad' in df.columns:
         min_val, max_val = valid_ranges['koi_prad']
-        invalid = (df['koi_prad'] < min_val) | (df['koi_prad'] > max_val)
-        for idx in df[invalid].index:
-            errors.append({
-                'row': int(idx),
-                'message': f'koi_prad out of range [{min_val}, {max_val}] R_earth'
-            })
-        mask &= ~invalid
+        values = df['koi_prad'].to_numpy()
+        flag((values < min_val) | (values > max_val), f'koi_prad out of range [{min_val}, {max_val}] R_earth')
 
     # Transit depth: 10 - 100,000 ppm
     # Parts per million decrease in star brightness during transit
@@ -202,43 +364,79 @@ def validate_physical_ranges(df: pd.DataFrame, stats: Dict) -> Tuple[pd.DataFram
     # Upper bound: Unphysically large transit (would be stellar eclipse)
     if 'koi_depth' in df.columns:
         min_val, max_val = valid_ranges['koi_depth']
-        invalid = (df['koi_depth'] < min_val) | (df['koi_depth'] > max_val)
-        for idx in df[invalid].index:
-            errors.append({
-                'row': int(idx),
-                'message': f'koi_depth out of range [{min_val}, {max_val}] ppm'
-            })
-        mask &= ~invalid
+        values = df['koi_depth'].to_numpy()
+        flag((values < min_val) | (values > max_val), f'koi_depth out of range [{min_val}, {max_val}] ppm')
 
     # Equilibrium temperature: 100 - 3000 K
     # Lower bound: Colder than ice giants (detection/modeling limit)
     # Upper bound: Hotter than ultra-hot Jupiters (stellar companion territory)
     if 'koi_teq' in df.columns:
         min_val, max_val = valid_ranges['koi_teq']
-        invalid = (df['koi_teq'] < min_val) | (df['koi_teq'] > max_val)
-        for idx in df[invalid].index:
-            errors.append({
-                'row': int(idx),
-                'message': f'koi_teq out of range [{min_val}, {max_val}] K'
-            })
-        mask &= ~invalid
+        values = df['koi_teq'].to_numpy()
+        flag((values < min_val) | (values > max_val), f'koi_teq out of range [{min_val}, {max_val}] K')
 
     # Physical constraint: Planet radius cannot exceed star radius
     # Conversion: 1 R_sun = 109.1 R_earth
     if {'koi_prad', 'koi_srad'}.issubset(df.columns):
-        invalid = df['koi_prad'] > (df['koi_srad'] * 109.1)
-        for idx in df[invalid].index:
-            errors.append({
-                'row': int(idx),
-                'message': 'koi_prad > koi_srad (planet larger than star)'
-            })
-        mask &= ~invalid
+        flag(df['koi_prad'].to_numpy() > (df['koi_srad'].to_numpy() * 109.1),
+             'koi_prad > koi_srad (planet larger than star)')
+
+    return invalid_any, errors
+
+
+def validate_physical_ranges(df: pd.DataFrame, stats: Dict,
+                             warnings: Optional[List[str]] = None) -> Tuple[pd.DataFrame, List[Dict]]:
+    """
+    Validate physical plausibility of exoplanet parameters and remove invalid rows.
+    Returns: (cleaned_dataframe, per_row_errors)
+    """
+    invalid, errors = range_violations(df, stats, warnings)
+
+    # Rows failing any rule are dropped in a single take
+    return df.take(np.flatnonzero(~invalid)), errors
+
+
+def missing_required(df: pd.DataFrame, required_features: List[str], candidates: Optional[np.ndarray] = None,
+                     warnings: Optional[List[str]] = None) -> Tuple[np.ndarray, List[Dict]]:
+    """
+    Filas sin alguna feature requerida, entre las filas `candidates` (todas si es None).
+    Returns: (mascara_de_filas, errores_por_fila)
+    """
+    errors = []
+    missing_any = np.zeros(len(df), dtype=bool)
+
+    for feat in [f for f in required_features if f in df.columns]:
+        missing_mask = df[feat].isna().to_numpy()
+        if candidates is not None:
+            missing_mask &= candidates
+        if missing_mask.any():
+            errors.extend(row_errors(df.index[missing_mask], f'Required feature {feat} is missing', warnings))
+            missing_any |= missing_mask
 
-    return df[mask].copy(), errors
+    return missing_any, errors
+
+
+def validate_rows(df: pd.DataFrame, required_features: List[str], stats: Dict,
+                  warnings: Optional[List[str]] = None) -> Tuple[pd.DataFrame, List[Dict]]:
+    """
+    validate_physical_ranges + el rechazo de filas sin features requeridas de
+    impute_missing_values, fusionados: ambas máscaras se calculan sobre el mismo frame
+    y las filas se eliminan en un solo take.
+
+    Mismo resultado que aplicar las dos etapas en orden: los errores de features
+    requeridas solo se reportan para filas que pasaron los rangos físicos (un NaN
+    nunca falla una regla de rango).
+    Returns: (df_limpio, errores_por_fila)
+    """
+    invalid, errors = range_violations(df, stats, warnings)
+    missing, missing_errors = missing_required(df, required_features, ~invalid, warnings)
+    errors.extend(missing_errors)
+    return df.take(np.flatnonzero(~(invalid | missing))), errors
 
 
 def impute_missing_values(df: pd.DataFrame, required_features: List[str],
-                          optional_features: List[str], stats: Dict) -> Tuple[pd.DataFrame, List[Dict]]:
+                          optional_features: List[str], stats: Dict,
+                          warnings: Optional[List[str]] = None) -> Tuple[pd.DataFrame, List[Dict]]:
     """
     Handle missing values using training set statistics.
 
@@ -256,33 +454,31 @@ def impute_missing_values(df: pd.DataFrame, required_features: List[str],
     Returns: (imputed_dataframe, per_row_errors)
     """
     medians = stats['medians_pretransform']
-    errors = []
 
     # Check required features - row rejected if missing
-    for feat in required_features:
-        if feat not in df.columns:
-            continue
-
-        missing_mask = df[feat].isna()
-        if missing_mask.any():
-            for idx in df[missing_mask].index:
-                errors.append({
-                    'row': int(idx),
-                    'message': f'Required feature {feat} is missing'
-                })
+    missing, errors = missing_required(df, required_features, warnings=warnings)
 
-    # Remove rows with missing required features
-    df = df.dropna(subset=[f for f in required_features if f in df.columns])
+    # Remove rows with missing required features (no copy when there are none,
+    # e.g. after validate_rows)
+    if missing.any():
+        df = df.take(np.flatnonzero(~missing))
 
     # Impute optional features with training median
     for feat in optional_features:
         if feat not in df.columns:
             continue
 
-        if df[feat].isna().any():
-            median_val = medians.get(feat)
-            if median_val is not None:
-                df[feat] = df[feat].fillna(median_val)
+        median_val = medians.get(feat)
+        if median_val is None:
+            continue
+
+        # Float columns are filled in place through the frame's own block (no new
+        # Series, no column re-link); anything else keeps the fillna route
+        values = df[feat].to_numpy()
+        if values.dtype.kind == 'f' and values.flags.writeable:
+            np.copyto(values, median_val, where=np.isnan(values))
+        elif df[feat].isna().any():
+            df[feat] = df[feat].fillna(median_val)
 
     return df, errors
 
@@ -302,72 +498,123 @@ def apply_log_transforms(df: pd.DataFrame, stats: Dict) -> pd.DataFrame:
     Implementation note: Column is transformed in-place (same name) to maintain compatibility
     with model.joblib's expected feature names.
     """
-    log_features = stats['log_transform_features']
+    log_features = [feat for feat in stats['log_transform_features'] if feat in df.columns]
+    if not log_features:
+        return df
 
-    for feat in log_features:
-        if feat not in df.columns:
-            continue
-
-        # Only transform positive values (log10 undefined for ≤0)
-        mask = df[feat] > 0
-        if mask.sum() == 0:
-            continue
+    # All log features as one float64 block: a single masked log10 pass
+    block = df[log_features].to_numpy(dtype=np.float64, copy=True)
 
-        # Create temporary log column
-        new_col = f'log_{feat}'
-        df[new_col] = np.nan
-        df.loc[mask, new_col] = np.log10(df.loc[mask, feat])
+    # Only transform positive values (log10 undefined for ≤0); a column without
+    # any positive value is left as it is
+    positive = block > 0
+    transform = positive.any(axis=0)
+    if not transform.any():
+        return df
 
-        # Replace original column with log-transformed values
-        df = df.drop(columns=[feat])
-        df = df.rename(columns={new_col: feat})
+    logged = np.full((len(block), int(transform.sum())), np.nan)
+    np.log10(block[:, transform], out=logged, where=positive[:, transform])
+    df[[feat for feat, t in zip(log_features, transform) if t]] = logged
 
     return df
 
 
-def remove_extreme_outliers(df: pd.DataFrame, features: List[str]) -> Tuple[pd.DataFrame, List[Dict]]:
+def _quartiles(values: np.ndarray) -> Tuple[float, float]:
+    """
+    Q1 y Q3 con interpolación lineal (mismo resultado que Series.quantile), usando
+    selección parcial con np.partition (O(n)) en lugar de ordenar la columna.
+    Source: Improved-RF/data.py (_quartiles)
+    """
+    positions = [(len(values) - 1) * q for q in (0.25, 0.75)]
+    pivots = sorted({int(np.floor(h)) for h in positions} | {int(np.ceil(h)) for h in positions})
+    values = np.partition(values, pivots)
+
+    result = []
+    for h in positions:
+        lo, hi = int(np.floor(h)), int(np.ceil(h))
+        a, b, t = values[lo], values[hi], h - lo
+        # Misma fórmula que numpy para evitar diferencias de redondeo
+        result.append(b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t)
+    return result[0], result[1]
+
+
+def remove_extreme_outliers(df: pd.DataFrame, features: List[str], stats: Optional[Mapping] = None,
+                            warnings: Optional[List[str]] = None) -> Tuple[pd.DataFrame, List[Dict]]:
     """
     Elimina outliers extremos POST-transformación usando 5*IQR.
+
+    Los límites por feature se toman de stats['outlier_bounds_5iqr'] (calculados sobre
+    el set de entrenamiento) cuando existen, así no dependen del tamaño ni de la
+    composición del upload. Sin ellos se calculan sobre los datos del upload.
     Returns: (df_limpio, errores_por_fila)
     """
     errors = []
-    mask = pd.Series([True] * len(df), index=df.index)
+    keep = np.ones(len(df), dtype=bool)
+    training_bounds = (stats or {}).get('outlier_bounds_5iqr', {})
 
     for feat in features:
         if feat not in df.columns:
             continue
 
-        data = df[feat].dropna()
-        if len(data) == 0:
-            continue
+        values = df[feat].to_numpy(dtype=np.float64)
+        if feat in training_bounds:
+            lower, upper = training_bounds[feat]
+        else:
+            data = values[~np.isnan(values)]
+            if len(data) == 0:
+                continue
 
-        # 5*IQR (muy permisivo, solo elimina extremos)
-        Q1 = data.quantile(0.25)
-        Q3 = data.quantile(0.75)
-        IQR = Q3 - Q1
+            # 5*IQR (muy permisivo, solo elimina extremos)
+            Q1, Q3 = _quartiles(data)
+            IQR = Q3 - Q1
 
-        lower = Q1 - 5 * IQR
-        upper = Q3 + 5 * IQR
+            lower = Q1 - 5 * IQR
+            upper = Q3 + 5 * IQR
 
-        invalid = (df[feat] < lower) | (df[feat] > upper)
+        invalid = (values < lower) | (values > upper)
         if invalid.any():
-            for idx in df[invalid].index:
-                errors.append({
-                    'row': int(idx),
-                    'message': f'{feat} is extreme outlier (5*IQR)'
-                })
-            mask &= ~invalid
+            errors.extend(row_errors(df.index[invalid], f'{feat} is extreme outlier (5*IQR)', warnings))
+            keep &= ~invalid
 
-    return df[mask].copy(), errors
+    # Rows flagged for any feature are dropped in a single take
+    return df.take(np.flatnonzero(keep)), errors
 
 
-def preprocess_csv(
-    input_csv_path: Path,
-    output_csv_path: Path,
-    stats: Dict
-) -> Dict:
+def _parquet_column(values: pd.Series):
+    """
+    float64 para columnas numéricas. Una columna de texto (un CSV ya preprocesado pasa
+    tal cual se leyó) se escribe como texto, igual que en el CSV: predict.py parsea sus
+    celdas y reporta por fila las que no son numéricas.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return pa.array(values.to_numpy(dtype=np.float64))
+    return pa.array([None if pd.isna(value) else str(value) for value in values], type=pa.string())
+
+
+def write_processed(df: pd.DataFrame, output_path: Path) -> None:
+    """
+    Guarda el resultado: Parquet (zstd) si la ruta termina en .parquet, CSV en otro caso.
+    Parquet conserva los float64 tal cual y evita formatear/parsear texto (predict.py lee ambos).
+    """
+    if output_path.suffix.lower() != '.parquet':
+        df.to_csv(output_path, index=False)
+        return
+
+    if pq is None:
+        raise PreprocessingError("Parquet output requires pyarrow")
+
+    # Columnas en el orden de FINAL_SCHEMA, tomadas por posición del frame y escritas
+    # con un schema explícito (sin índice ni metadatos de pandas)
+    features = [f for f in FINAL_SCHEMA if f in df.columns]
+    arrays = [_parquet_column(df[f]) for f in features]
+    schema = pa.schema([(f, array.type) for f, array in zip(features, arrays)])
+    pq.write_table(pa.Table.from_arrays(arrays, schema=schema), output_path,
+                   compression='zstd', compression_level=3)
+
+
+def preprocess_frame(input_csv_path: Path, stats: Dict) -> Tuple[Optional[pd.DataFrame], Dict]:
     """
-    Complete preprocessing pipeline for raw Kepler CSVs.
+    Complete preprocessing pipeline for raw Kepler CSVs, in memory.
 
     Orchestrates all preprocessing steps in the correct order to ensure data matches
     the training distribution exactly. Steps execute sequentially to maintain data integrity.
@@ -376,15 +623,17 @@ def preprocess_csv(
     1. Load CSV → 2. Normalize columns → 3. Validate required columns exist →
     4. Remove leakage features → 5. Remove duplicates → 6. Validate physical ranges →
     7. Impute missing values → 8. Apply log transforms → 9. Remove outliers →
-    10. Select final features → 11. Save processed CSV
+    10. Select final features
 
     Args:
         input_csv_path: Raw CSV from user upload
-        output_csv_path: Destination for processed CSV (ready for model.joblib)
         stats: Training statistics from training_stats.json
 
     Returns:
-        Dictionary with preprocessing statistics and per-row errors:
+        (processed_frame, result). The frame holds the model features of the kept
+        rows, ready for model.joblib; it is None when preprocessing failed.
+        `result` is a dictionary with preprocessing statistics and per-row errors (at most
+        MAX_ERRORS_PER_CHECK per failed check; the full count goes to warnings):
         {
             'success': bool,
             'original_rows': int,
@@ -395,12 +644,9 @@ def preprocess_csv(
         }
     """
     # Model expects exactly these 11 features in this order
-    required_features = ['koi_period', 'koi_depth', 'koi_duration', 'koi_prad']
-    optional_features = [
-        'koi_teq', 'koi_insol', 'koi_steff', 'koi_slogg',
-        'koi_srad', 'koi_model_snr', 'koi_impact'
-    ]
-    all_features = required_features + optional_features
+    required_features = list(REQUIRED_FEATURES)
+    optional_features = list(OPTIONAL_FEATURES)
+    all_features = list(FINAL_SCHEMA)
 
     # Initialize result tracking
     result = {
@@ -413,16 +659,16 @@ def preprocess_csv(
     }
 
     try:
-        # 1. Load CSV
-        df = pd.read_csv(input_csv_path, comment='#')
+        # 1. Load CSV (chunked), keeping only the columns the pipeline reads
+        # 2. Normalize column names (per chunk)
+        df = read_pipeline_columns(input_csv_path, all_features + ['kepoi_name'])
         result['original_rows'] = len(df)
+        # Column names as a set, computed once for the membership checks below
+        columns = frozenset(df.columns)
 
         if len(df) == 0:
             raise PreprocessingError("CSV file is empty")
 
-        # 2. Normalize column names
-        df = normalize_column_names(df)
-
         # 3. CRITICAL: Detect if CSV is already preprocessed
         already_preprocessed = is_already_preprocessed(df)
 
@@ -434,24 +680,23 @@ def preprocess_csv(
             )
 
             # Validate required columns exist
-            is_valid, missing = validate_required_features(df, required_features)
+            is_valid, missing = validate_required_features(df, required_features, columns)
             if not is_valid:
                 raise PreprocessingError(
                     f"CSV missing required columns: {', '.join(missing)}"
                 )
 
-            # Select only model features and save directly
-            available_features = [f for f in all_features if f in df.columns]
+            # Select only model features, as they are
+            available_features = [f for f in all_features if f in columns]
             df = df[available_features]
-            df.to_csv(output_csv_path, index=False)
 
             result['processed_rows'] = len(df)
             result['removed_rows'] = 0
             result['success'] = True
-            return result
+            return df, result
 
         # 4. Validate required features exist
-        is_valid, missing = validate_required_features(df, required_features)
+        is_valid, missing = validate_required_features(df, required_features, columns)
         if not is_valid:
             raise PreprocessingError(
                 f"CSV missing required columns: {', '.join(missing)}"
@@ -461,22 +706,31 @@ def preprocess_csv(
         df = remove_leakage_features(df)
 
         # 6. Remove duplicates by kepoi_name (if exists)
-        if 'kepoi_name' in df.columns:
-            before = len(df)
-            df = df.drop_duplicates(subset='kepoi_name', keep='first')
-            after = len(df)
-            if before > after:
+        # Same rows as drop_duplicates, but the frame is only copied when there is
+        # something to drop
+        if 'kepoi_name' in columns:
+            duplicated = df.duplicated(subset='kepoi_name', keep='first').to_numpy()
+            n_duplicates = int(duplicated.sum())
+            if n_duplicates:
+                df = df.take(np.flatnonzero(~duplicated))
                 result['warnings'].append(
-                    f'Removed {before - after} duplicate kepoi_name entries'
+                    f'Removed {n_duplicates} duplicate kepoi_name entries'
                 )
 
-        # 7. Validate physical ranges
-        df, range_errors = validate_physical_ranges(df, stats)
+        # Projection pushdown: kepoi_name was only needed for deduplication and every
+        # later stage reads model features only, so the row filters below copy just
+        # the float columns (selecting them is otherwise the last step)
+        available_features = [f for f in all_features if f in columns]
+        df = df[available_features]
+
+        # 7. Validate physical ranges (and reject rows missing required features,
+        # in the same row filter: see validate_rows)
+        df, range_errors = validate_rows(df, required_features, stats, result['warnings'])
         result['errors'].extend(range_errors)
 
         # 8. Impute missing values
         df, imputation_errors = impute_missing_values(
-            df, required_features, optional_features, stats
+            df, required_features, optional_features, stats, result['warnings']
         )
         result['errors'].extend(imputation_errors)
 
@@ -484,25 +738,50 @@ def preprocess_csv(
         df = apply_log_transforms(df, stats)
 
         # 10. Remove extreme outliers post-transformation
-        df, outlier_errors = remove_extreme_outliers(df, all_features)
+        df, outlier_errors = remove_extreme_outliers(df, all_features, stats, result['warnings'])
         result['errors'].extend(outlier_errors)
 
-        # 11. Select only model-expected features
-        available_features = [f for f in all_features if f in df.columns]
-        df = df[available_features]
-
-        # 12. Save processed CSV
-        df.to_csv(output_csv_path, index=False)
+        # 11. Only model-expected features remain (selected after step 6)
 
         result['processed_rows'] = len(df)
         result['removed_rows'] = result['original_rows'] - result['processed_rows']
         result['success'] = True
+        return df, result
 
     except PreprocessingError as e:
         result['errors'].append({'row': -1, 'message': str(e)})
     except Exception as e:
         result['errors'].append({'row': -1, 'message': f'Unexpected error: {str(e)}'})
 
+    return None, result
+
+
+def preprocess_csv(
+    input_csv_path: Path,
+    output_csv_path: Path,
+    stats: Dict
+) -> Dict:
+    """
+    Run preprocess_frame and save the processed data (CSV or Parquet, by extension)
+    to `output_csv_path`, for a model run in another process.
+    Callers in the same process as the model use preprocess_frame and skip the file.
+
+    Returns: the preprocess_frame result dictionary
+    """
+    df, result = preprocess_frame(input_csv_path, stats)
+    if df is None:
+        return result
+
+    try:
+        write_processed(df, output_csv_path)
+        return result
+    except PreprocessingError as e:
+        message = str(e)
+    except Exception as e:
+        message = f'Unexpected error: {str(e)}'
+
+    result.update(success=False, processed_rows=0, removed_rows=0)
+    result['errors'].append({'row': -1, 'message': message})
     return result
 
 
@@ -510,7 +789,7 @@ def main() -> int:
     """CLI para preprocesamiento."""
     parser = argparse.ArgumentParser(description="Preprocess raw CSV for HuntEX model")
     parser.add_argument('--input', type=Path, required=True, help='Input raw CSV path')
-    parser.add_argument('--output', type=Path, required=True, help='Output processed CSV path')
+    parser.add_argument('--output', type=Path, required=True, help='Output processed CSV (or .parquet) path')
     args = parser.parse_args()
 
     try: